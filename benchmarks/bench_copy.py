@@ -0,0 +1,265 @@
+"""
+セレクト→記念スタジオ→メインPC の処理全体のベンチマーク。
+
+make_shoot_tree.py で生成した撮影フォルダに対して、
+フォルダ解決・ファイル照合・レーティング抽出・コピーをそれぞれ単独で計測し、
+最後に CopyEngine.run() 全体の時間を計測する。ネットワークは使わない。
+
+結果はJSONで保存でき、--compare で保存済みの結果（ベースライン）と比べられる。
+ファイルはOSのキャッシュに載った状態で計測されるため、
+実際のSMB越しの速度ではなく処理そのもののオーバーヘッドの比較に使う。
+
+例:
+    python benchmarks/bench_copy.py --shoots 10 --files-per-shoot 300 --save benchmarks/baselines/local.json
+    python benchmarks/bench_copy.py --shoots 10 --files-per-shoot 300 --compare benchmarks/baselines/local.json
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from copy_engine import CopyEngine, CopyConfig, SelectListing  # noqa: E402
+from copy_events import NumberDone, ErrorOccurred, RUN_DONE  # noqa: E402
+from fast_copy import ParallelCopier  # noqa: E402
+from folder_scan import filename_key  # noqa: E402
+from make_shoot_tree import make_shoot_tree, tree_roots  # noqa: E402
+
+PHASES = ("resolve", "match", "rating", "copy", "end_to_end")
+
+
+def drop_caches():
+    # Linux で root の場合のみ、OSのファイルキャッシュを捨てて読み込みから計測する
+    try:
+        os.sync()
+        with open("/proc/sys/vm/drop_caches", "w") as f:
+            f.write("3\n")
+        return True
+    except OSError:
+        return False
+
+
+def make_config(folder_numbers, roots, args, destination_folder_path=None):
+    select_root, studio_root, main_root = roots
+    return CopyConfig(
+        folder_numbers, select_root, studio_root, destination_folder_path or main_root,
+        rating_workers=args.rating_workers,
+        copy_workers=args.copy_workers,
+        number_workers=args.number_workers,
+        # 毎回同じ処理量になるよう、再開やコピー済み判定は使わない
+        use_journal=False,
+        skip_identical=None,
+        write_report=False,
+    )
+
+
+def measure_phases(folder_numbers, roots, destination, args):
+    """ 各段階を順に実行し、{段階: (秒数, 件数, バイト数)} を返す。 """
+    select_root, studio_root, _ = roots
+    engine = CopyEngine(make_config(folder_numbers, roots, args, destination))
+    # run() を通さずに各段階を呼ぶため、実行中フラグを自分で立てる
+    engine.copy_in_progress = True
+    results = {}
+
+    started = time.perf_counter()
+    select_index = engine.build_shoot_folder_index(select_root)
+    studio_index = engine.build_shoot_folder_index(studio_root)
+    image_presence = {}
+    resolved = []
+    for number in folder_numbers:
+        select_folder = engine.find_folder_with_number(select_index, number, image_presence)
+        studio_folder = engine.find_folder_with_number(studio_index, number, image_presence)
+        if select_folder is not None and studio_folder is not None:
+            resolved.append((number, select_folder, studio_folder))
+    results["resolve"] = (time.perf_counter() - started, len(resolved), 0)
+
+    # 照合はエンジンと同じ経路（サイドカーの対応付けと形式の判定を含む）で計測する
+    started = time.perf_counter()
+    matched = []
+    sidecars = {}
+    for number, select_folder, studio_folder in resolved:
+        studio_files = engine.list_studio_files(studio_folder)
+        listing = SelectListing(number)
+        for path in engine.iter_matched_files(select_folder, studio_files, listing):
+            matched.append((path, studio_files[filename_key(os.path.basename(path))], os.path.basename(studio_folder)))
+        sidecars.update(listing.sidecars)
+    results["match"] = (time.perf_counter() - started, len(matched), 0)
+
+    started = time.perf_counter()
+    selected = []
+    studio_by_select = {path: (studio_path, folder) for path, studio_path, folder in matched}
+    for path, fields in engine.iter_xmp_fields([path for path, _, _ in matched], sidecars=sidecars):
+        if engine.rule.matches(fields):
+            selected.append(studio_by_select[path])
+    # ヘッダーしか読まないため、読み込んだバイト数は記録しない
+    results["rating"] = (time.perf_counter() - started, len(matched), 0)
+
+    started = time.perf_counter()
+    copier = ParallelCopier(workers=args.copy_workers).start()
+    try:
+        for studio_path, folder in selected:
+            copier.submit(studio_path, os.path.join(destination, folder), os.path.basename(studio_path))
+    finally:
+        copier.finish()
+    results["copy"] = (time.perf_counter() - started, copier.copied_files, copier.copied_bytes)
+    engine.copy_in_progress = False
+    return results
+
+
+def measure_end_to_end(folder_numbers, roots, destination, args):
+    done = []
+    errors = []
+
+    def on_event(event):
+        if isinstance(event, NumberDone):
+            done.append(event)
+        elif isinstance(event, ErrorOccurred):
+            errors.append(event)
+
+    # メインPCの年度フォルダは存在している前提
+    os.makedirs(destination, exist_ok=True)
+    engine = CopyEngine(make_config(folder_numbers, roots, args, destination), listeners=[on_event])
+    started = time.perf_counter()
+    status = engine.run()
+    seconds = time.perf_counter() - started
+    if status != RUN_DONE or errors:
+        raise RuntimeError(f"CopyEngine.run() finished with status {status}: {errors[:3]}")
+    return seconds, sum(event.copied for event in done), sum(event.bytes for event in done)
+
+
+def run_benchmark(args):
+    work_folder = tempfile.mkdtemp(prefix="photocopy_bench_", dir=args.work_folder)
+    try:
+        tree_root = os.path.join(work_folder, "tree")
+        started = time.perf_counter()
+        folder_numbers = make_shoot_tree(
+            tree_root, args.shoots, args.files_per_shoot, args.rating5_share,
+            args.select_size * 1024, args.studio_size * 1024, seed=args.seed,
+        )
+        print(f"生成: {args.shoots}件 x {args.files_per_shoot}枚 ({time.perf_counter() - started:.1f}秒)", file=sys.stderr)
+        roots = tree_roots(tree_root)
+
+        runs = {phase: [] for phase in PHASES}
+        for repeat in range(args.repeat):
+            destination = os.path.join(work_folder, f"main_{repeat}")
+            if args.drop_caches:
+                drop_caches()
+            for phase, result in measure_phases(folder_numbers, roots, destination, args).items():
+                runs[phase].append(result)
+            shutil.rmtree(destination, ignore_errors=True)
+
+            destination = os.path.join(work_folder, f"main_e2e_{repeat}")
+            if args.drop_caches:
+                drop_caches()
+            # CopyEngine の print() は計測結果と混ざらないよう標準エラーへ回す
+            with contextlib.redirect_stdout(sys.stderr):
+                runs["end_to_end"].append(measure_end_to_end(folder_numbers, roots, destination, args))
+            shutil.rmtree(destination, ignore_errors=True)
+    finally:
+        if not args.keep:
+            shutil.rmtree(work_folder, ignore_errors=True)
+
+    phases = {}
+    for phase, results in runs.items():
+        seconds = [result[0] for result in results]
+        median = statistics.median(seconds)
+        items, nbytes = results[0][1], results[0][2]
+        phases[phase] = {
+            "seconds": round(median, 4),
+            "runs": [round(value, 4) for value in seconds],
+            "items": items,
+            "bytes": nbytes,
+            "items_per_second": round(items / median, 1) if median > 0 else None,
+            "mb_per_second": round(nbytes / median / 1024 / 1024, 1) if median > 0 and nbytes else None,
+        }
+    return {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "params": {
+            "shoots": args.shoots,
+            "files_per_shoot": args.files_per_shoot,
+            "rating5_share": args.rating5_share,
+            "select_size_kb": args.select_size,
+            "studio_size_kb": args.studio_size,
+            "rating_workers": args.rating_workers,
+            "copy_workers": args.copy_workers,
+            "number_workers": args.number_workers,
+            "repeat": args.repeat,
+            "drop_caches": args.drop_caches,
+            "seed": args.seed,
+        },
+        "phases": phases,
+    }
+
+
+def compare(result, baseline, threshold):
+    """ ベースラインより threshold 以上遅くなった段階の名前を返す。 """
+    if result["params"] != baseline.get("params"):
+        print("注意: ベースラインと条件が異なります", file=sys.stderr)
+    regressions = []
+    for phase in PHASES:
+        current = result["phases"].get(phase)
+        previous = baseline.get("phases", {}).get(phase)
+        if not current or not previous or not previous["seconds"]:
+            continue
+        ratio = current["seconds"] / previous["seconds"]
+        mark = ""
+        if ratio > 1 + threshold:
+            regressions.append(phase)
+            mark = "  <-- 遅くなりました"
+        print(f"{phase:<11} {previous['seconds']:>9.4f}s -> {current['seconds']:>9.4f}s  x{ratio:.2f}{mark}")
+    return regressions
+
+
+def print_result(result):
+    for phase in PHASES:
+        values = result["phases"][phase]
+        rate = f", {values['mb_per_second']}MB/s" if values["mb_per_second"] else ""
+        print(f"{phase:<11} {values['seconds']:>9.4f}s  {values['items']}件 ({values['items_per_second']}件/s{rate})")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="コピー処理全体のベンチマークを実行します。")
+    parser.add_argument("--shoots", type=int, default=5, help="撮影No.の数")
+    parser.add_argument("--files-per-shoot", type=int, default=300, help="撮影No.ごとのファイル数")
+    parser.add_argument("--rating5-share", type=float, default=0.1, help="星5のファイルの割合")
+    parser.add_argument("--select-size", type=int, default=64, help="セレクト側のファイルサイズ(KB)")
+    parser.add_argument("--studio-size", type=int, default=256, help="記念スタジオ側のファイルサイズ(KB)")
+    parser.add_argument("--rating-workers", type=int, default=8)
+    parser.add_argument("--copy-workers", type=int, default=4)
+    parser.add_argument("--number-workers", type=int, default=2)
+    parser.add_argument("--repeat", type=int, default=3, help="繰り返し回数（中央値を使う）")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--drop-caches", action="store_true", help="各計測の前にOSのキャッシュを捨てる（Linuxのrootのみ）")
+    parser.add_argument("--work-folder", help="生成先の親フォルダ（既定は一時フォルダ）")
+    parser.add_argument("--keep", action="store_true", help="生成したフォルダを削除しない")
+    parser.add_argument("--save", help="結果をJSONで保存するパス")
+    parser.add_argument("--compare", help="比較するベースラインのJSON")
+    parser.add_argument("--threshold", type=float, default=0.2, help="遅くなったとみなす割合（0.2 = 20%%）")
+    args = parser.parse_args(argv)
+
+    result = run_benchmark(args)
+    print_result(result)
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if compare(result, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
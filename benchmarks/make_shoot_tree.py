@@ -0,0 +1,131 @@
+"""
+ベンチマーク用の撮影フォルダを生成する。
+
+セレクトPC側・記念スタジオ側・メインPCの3つのルートを作り、
+<年度>/<撮影No.>_<名前>/ の下に同じファイル名のJPEGを置く。
+セレクト側のJPEGには Lightroom と同じ形式で Xmp.xmp.Rating を埋め込み、
+rating5_share の割合で星5にする。記念スタジオ側はレーティング無しの大きめのJPEGにする。
+実際の現場と同じく、ハイフン付きの別フォルダや画像の無いフォルダも混ぜる。
+
+例:
+    python benchmarks/make_shoot_tree.py /tmp/shoot_tree --shoots 20 --files-per-shoot 300
+"""
+import argparse
+import os
+import random
+import struct
+import sys
+
+XMP_TEMPLATE = (
+    '<?xpacket begin="﻿" id="W5M0MpCehiHzreSzNTczkc9d"?>\n'
+    '<x:xmpmeta xmlns:x="adobe:ns:meta/" x:xmptk="Adobe XMP Core 7.0-c000">\n'
+    ' <rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#">\n'
+    '  <rdf:Description rdf:about=""\n'
+    '    xmlns:xmp="http://ns.adobe.com/xap/1.0/"\n'
+    '    xmlns:photoshop="http://ns.adobe.com/photoshop/1.0/"\n'
+    '   xmp:Rating="{rating}"\n'
+    '   xmp:CreatorTool="Adobe Photoshop Lightroom Classic 13.0 (Windows)"\n'
+    '   photoshop:DateCreated="2024-04-01T10:00:00"/>\n'
+    ' </rdf:RDF>\n'
+    '</x:xmpmeta>\n'
+    '{padding}'
+    '<?xpacket end="w"?>'
+)
+XMP_SIGNATURE = b"http://ns.adobe.com/xap/1.0/\x00"
+EXIF_SIGNATURE = b"Exif\x00\x00"
+
+
+def segment(marker, payload):
+    return b"\xff" + bytes([marker]) + struct.pack(">H", len(payload) + 2) + payload
+
+
+def random_bytes(rng, size):
+    # random.randbytes は Python 3.9 以降のため使わない
+    return rng.getrandbits(size * 8).to_bytes(size, "little") if size else b""
+
+
+def make_jpeg(size, rating=None, rng=random):
+    """
+    画像としては表示できないが、マーカー構造は実際のJPEGと同じファイルを作る。
+    rating が None の場合は XMP を付けない。
+    """
+    parts = [b"\xff\xd8", segment(0xE0, b"JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00")]
+    # カメラのExifとサムネイル相当
+    parts.append(segment(0xE1, EXIF_SIGNATURE + random_bytes(rng, 8 * 1024)))
+    if rating is not None:
+        # Lightroom はXMPパケットの後ろに書き換え用の空白を入れる
+        xmp = XMP_TEMPLATE.format(rating=rating, padding=" " * 2048 + "\n").encode("utf-8")
+        parts.append(segment(0xE1, XMP_SIGNATURE + xmp))
+    parts.append(segment(0xDB, b"\x00" + bytes(64)))
+    parts.append(segment(0xC0, b"\x08\x0f\xa0\x17\x70\x03\x01\x22\x00\x02\x11\x01\x03\x11\x01"))
+    parts.append(segment(0xDA, b"\x03\x01\x00\x02\x11\x03\x11\x00\x3f\x00"))
+    header = b"".join(parts)
+    body_size = max(0, size - len(header) - 2)
+    # 圧縮データ中の 0xFF はマーカーと区別するため 0x00 を後ろに付ける決まりなので、ここでは含めない
+    body = random_bytes(rng, body_size).replace(b"\xff", b"\xfe")
+    return header + body + b"\xff\xd9"
+
+
+def tree_roots(root, year="2024"):
+    """ (セレクト側, 記念スタジオ側, メインPC) の年度フォルダを返す。 """
+    return tuple(os.path.join(root, side, year) for side in ("select", "studio", "main"))
+
+
+def make_shoot_tree(root, shoots=10, files_per_shoot=200, rating5_share=0.1, select_size=64 * 1024,
+                    studio_size=256 * 1024, year="2024", subfolders=2, decoys=True, seed=0):
+    """
+    root の下に select / studio / main を作り、撮影No.のリストを返す。
+    """
+    rng = random.Random(seed)
+    select_year, studio_year, main_year = tree_roots(root, year)
+    os.makedirs(main_year, exist_ok=True)
+    folder_numbers = []
+    for shoot in range(shoots):
+        number = f"{1000 + shoot:04d}"
+        folder_numbers.append(number)
+        name = f"{number}_撮影{shoot}様"
+        select_folder = os.path.join(select_year, name)
+        studio_folder = os.path.join(studio_year, name)
+        if decoys:
+            # 撮影No.の前方一致で先に見つかるが、対象外のフォルダ
+            os.makedirs(os.path.join(select_year, f"{number}-2_追加撮影"), exist_ok=True)
+            os.makedirs(os.path.join(studio_year, f"{number}_空フォルダ"), exist_ok=True)
+        for index in range(files_per_shoot):
+            # セレクト側はカメラごとのサブフォルダに分かれていることがある
+            sub = f"CAM{index % subfolders + 1}" if subfolders > 1 else ""
+            filename = f"IMG_{number}_{index:05d}.jpg"
+            rating = "5" if rng.random() < rating5_share else str(rng.choice((0, 1, 2, 3, 4)))
+            select_path = os.path.join(select_folder, sub, filename)
+            os.makedirs(os.path.dirname(select_path), exist_ok=True)
+            with open(select_path, "wb") as f:
+                f.write(make_jpeg(select_size, rating, rng))
+            studio_path = os.path.join(studio_folder, filename)
+            os.makedirs(studio_folder, exist_ok=True)
+            with open(studio_path, "wb") as f:
+                f.write(make_jpeg(studio_size, None, rng))
+    return folder_numbers
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ベンチマーク用の撮影フォルダを生成します。")
+    parser.add_argument("root", help="生成先のフォルダ")
+    parser.add_argument("--shoots", type=int, default=10, help="撮影No.の数")
+    parser.add_argument("--files-per-shoot", type=int, default=200, help="撮影No.ごとのファイル数")
+    parser.add_argument("--rating5-share", type=float, default=0.1, help="星5のファイルの割合")
+    parser.add_argument("--select-size", type=int, default=64, help="セレクト側のファイルサイズ(KB)")
+    parser.add_argument("--studio-size", type=int, default=256, help="記念スタジオ側のファイルサイズ(KB)")
+    parser.add_argument("--subfolders", type=int, default=2, help="セレクト側のサブフォルダ数")
+    parser.add_argument("--no-decoys", action="store_true", help="対象外のフォルダを作らない")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    folder_numbers = make_shoot_tree(
+        args.root, args.shoots, args.files_per_shoot, args.rating5_share,
+        args.select_size * 1024, args.studio_size * 1024,
+        subfolders=args.subfolders, decoys=not args.no_decoys, seed=args.seed,
+    )
+    print(",".join(folder_numbers))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
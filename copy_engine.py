@@ -0,0 +1,672 @@
+"""
+セレクトPC→記念スタジオPC→メインPC のコピー処理本体。
+
+GUI（sub_to_main.py）とコマンドライン（sub_to_main_cli.py）の両方から使うため、
+tkinter や winreg には依存しない。進捗は copy_events のイベントとして
+登録されたリスナーに渡される（リスナーはコピー用のスレッドからも呼ばれる）。
+"""
+import collections
+import itertools
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
+
+import file_types
+import xmp_rating
+from selection_rule import compile_rule, DEFAULT_RULE, RuleError
+from rating_index import RatingIndex, INDEX_FILENAME
+from fast_copy import ParallelCopier, DEFAULT_BUFFER_SIZE, SKIP_SIZE_MTIME
+from copy_events import (
+    RunStarted, FolderCheckStarted, FolderSearchStarted, FolderResolved, FolderNotFound, FilesMatched,
+    DuplicateFilesFound, FileRated, BytesCopied, FileCopied, FileSkipped, NumberDone, RunFinished, JournalResumed,
+    ReportWritten,
+    RUN_DONE, RUN_CANCELLED, RUN_ERROR, error_event,
+)
+from io_limits import IOLimiter
+from verify_manifest import VerifyManifest
+from notification_log import LOG_FOLDER_NAME
+from run_report import RunReport, NullRunReport
+from job_journal import JobJournal, JOURNAL_FOLDER_NAME, journal_key
+from folder_scan import (
+    ShootFolderIndex, iter_folder_batches, contains_image_files, build_basename_index, filename_key,
+)
+
+# FilesMatched で通知する、記念スタジオ側に無いファイル名の上限（件数は全て数える）
+MAX_UNMATCHED_FILENAMES = 100
+
+
+def get_data_folder():
+    # 設定と同じくユーザーごとの保存先（実行ファイルの展開先には書き込まない）
+    base_folder = os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), ".local", "share")
+    return os.path.join(base_folder, "PhotoCopyTool")
+
+
+def open_rating_index(index_path=None):
+    try:
+        index = RatingIndex(index_path or os.path.join(get_data_folder(), INDEX_FILENAME))
+        index.evict()
+        return index
+    except Exception as e:
+        print(f"レーティングインデックスを開けません: {e}")
+        return None
+
+
+class CopyConfig:
+    def __init__(self, folder_numbers, source_folder1_path, source_folder2_path, destination_folder_path,
+                 rating_workers=8, copy_workers=4, copy_buffer_size=DEFAULT_BUFFER_SIZE,
+                 copy_queue_size=32, use_temp_copy_folder=False, number_workers=2, io_limit=12,
+                 use_journal=True, journal_folder=None, skip_identical=SKIP_SIZE_MTIME,
+                 verify=None, manifest_folder=None, write_report=True, report_folder=None,
+                 selection_rule=DEFAULT_RULE, host_io_limit=6):
+        self.folder_numbers = list(folder_numbers)
+        # セレクトPC側、記念スタジオ側、メインPCの年度フォルダ
+        self.source_folder1_path = source_folder1_path
+        self.source_folder2_path = source_folder2_path
+        self.destination_folder_path = destination_folder_path
+        # レーティング抽出の並列数（ネットワーク越しの読み込み待ちを重ねるため）
+        self.rating_workers = rating_workers
+        # メインPCへの同時コピー数と読み書きのバッファサイズ
+        self.copy_workers = copy_workers
+        self.copy_buffer_size = copy_buffer_size
+        # レーティング抽出からコピー処理へ渡す待ち行列の上限
+        self.copy_queue_size = copy_queue_size
+        # True の場合は従来通り temp_copy_folder を経由してからメインPCへ移動する
+        self.use_temp_copy_folder = use_temp_copy_folder
+        # 同時に処理する撮影No.の数
+        self.number_workers = number_workers
+        # 全ての撮影No.で共有する同時I/O数の上限（フォルダ走査・レーティング読み込み・コピー）
+        self.io_limit = io_limit
+        # ファイルサーバー（セレクトPC・記念スタジオPC・メインPC）ごとの同時I/O数の上限（None で制限しない）
+        self.host_io_limit = host_io_limit
+        # 中断した実行を再開するための作業記録（既定はデータフォルダの journals）
+        self.use_journal = use_journal
+        self.journal_folder = journal_folder
+        # メインPCに同じファイルがある場合はコピーを省く（SKIP_SIZE_MTIME / SKIP_HASH / None で常に上書き）
+        self.skip_identical = skip_identical
+        # コピー内容の確認（VERIFY_SYNC は fsync のみ、VERIFY_READBACK は読み直して比較、None はしない）と、
+        # 不一致を記録するフォルダ（既定はデータフォルダの logs）
+        self.verify = verify
+        self.manifest_folder = manifest_folder
+        # 段階ごとの所要時間を計測し、実行ごとにJSONのレポートを保存する（既定はデータフォルダの logs）
+        self.write_report = write_report
+        self.report_folder = report_folder
+        # コピーする画像を選ぶ条件（selection_rule.py の書き方、例: "rating >= 4"）
+        self.selection_rule = selection_rule
+
+
+class SelectListing:
+    """ セレクト側の一覧を読みながら数える件数。completed になるまで total() は None を返す。 """
+
+    def __init__(self, number):
+        self.number = number
+        self.select_files = 0
+        self.matched = 0
+        self.unsupported = 0
+        self.unmatched = 0
+        self.unmatched_filenames = []
+        # 画像のパス → サイドカーのパス（読み終えたフォルダの分）
+        self.sidecars = {}
+        self.completed = False
+
+    def add_unmatched(self, filename):
+        self.unmatched += 1
+        if len(self.unmatched_filenames) < MAX_UNMATCHED_FILENAMES:
+            self.unmatched_filenames.append(filename)
+
+    def total(self):
+        return self.matched if self.completed else None
+
+
+class CopyEngine:
+    def __init__(self, config, listeners=(), rating_index=None):
+        self.config = config
+        # 条件の書き方の誤りは実行前（エンジンの作成時）に ValueError で知らせる
+        self.rule = compile_rule(config.selection_rule)
+        # listener(イベント) の形で呼び出す
+        self.listeners = list(listeners)
+        self.copy_in_progress = False
+        # exiv2 の初期化処理はスレッドセーフではないため、フォールバック時は直列化する
+        self.exiv2_lock = threading.Lock()
+        # (パス, サイズ, 更新時刻) ごとのXMPの値を保存し、再実行時の読み込みを省く
+        self.rating_index = rating_index
+        self.io_limiter = IOLimiter(config.io_limit, config.host_io_limit)
+        # 同じコピー先フォルダに解決された撮影No.は同時にコピーしない
+        self.destination_locks = {}
+        self.destination_locks_lock = threading.Lock()
+        self.journal = None
+        self.verify_manifest = VerifyManifest(config.manifest_folder or os.path.join(get_data_folder(), LOG_FOLDER_NAME))
+        self.report = NullRunReport()
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def emit(self, event):
+        for listener in self.listeners:
+            listener(event)
+
+    def cancel(self):
+        # 実行中でなければ False を返す
+        if not self.copy_in_progress:
+            return False
+        self.copy_in_progress = False
+        return True
+
+    def start(self):
+        # 別スレッドで run() を実行する。実行中フラグは呼び出し元のスレッドで立てる
+        self.copy_in_progress = True
+        copy_thread = threading.Thread(target=self.run_in_progress)
+        copy_thread.start()
+        return copy_thread
+
+    def run(self):
+        """ 同期的に実行し、RUN_DONE / RUN_CANCELLED / RUN_ERROR のいずれかを返す。 """
+        self.copy_in_progress = True
+        return self.run_in_progress()
+
+    def run_in_progress(self):
+        config = self.config
+        status = RUN_ERROR
+        self.report = RunReport() if config.write_report else NullRunReport()
+        try:
+            self.emit(RunStarted(config.folder_numbers, self.rule.text))
+            self.open_journal()
+            print(f"destination_folder_path: {config.destination_folder_path}")
+            print(f"Source folder 1 path: {config.source_folder1_path}")
+            print(f"Source folder 2 path: {config.source_folder2_path}")
+
+            with self.report.phase("check_folders"):
+                folders_ok = self.check_folders(config.source_folder1_path, config.source_folder2_path,
+                                                config.destination_folder_path)
+            if folders_ok:
+                self.copy_images(config.folder_numbers, config.source_folder1_path,
+                                 config.source_folder2_path, config.destination_folder_path)
+                status = RUN_DONE if self.copy_in_progress else RUN_CANCELLED
+        except Exception as e:
+            self.emit(error_event("run", e))
+            print(f"Error details: {e}")
+        finally:
+            self.copy_in_progress = False
+            self.flush_rating_index()
+            self.close_journal(completed=status == RUN_DONE)
+        self.save_report(status)
+        self.emit(RunFinished(status))
+        return status
+
+    def check_folders(self, source_folder1_path, source_folder2_path, destination_folder_path):
+        # フォルダアクセス可能性をチェック
+        self.emit(FolderCheckStarted())
+        for folder_path, role in ((source_folder1_path, "select"),
+                                  (source_folder2_path, "studio"),
+                                  (destination_folder_path, "main")):
+            if not os.path.exists(folder_path):
+                self.emit(error_event("folder_access", FileNotFoundError(2, "folder not accessible", folder_path), role=role))
+                return False
+        return True
+
+    def save_report(self, status):
+        self.report.finish(status)
+        if not self.config.write_report:
+            return
+        config = self.config
+        try:
+            path = self.report.write(config.report_folder or os.path.join(get_data_folder(), LOG_FOLDER_NAME), {
+                "folder_numbers": config.folder_numbers,
+                "config": {name: value for name, value in vars(config).items() if name != "folder_numbers"},
+            })
+        except Exception as e:
+            print(f"実行レポートの保存エラー: {e}")
+            return
+        self.emit(ReportWritten(path))
+
+    def open_journal(self):
+        config = self.config
+        if not config.use_journal:
+            return
+        journal_folder = config.journal_folder or os.path.join(get_data_folder(), JOURNAL_FOLDER_NAME)
+        key = journal_key(config.folder_numbers, config.source_folder1_path, config.source_folder2_path,
+                          config.destination_folder_path)
+        try:
+            self.journal = JobJournal(os.path.join(journal_folder, f"job_{key}.jsonl"))
+        except Exception as e:
+            # 記録できなくてもコピー自体は行う
+            print(f"作業記録を開けません: {e}")
+            self.journal = None
+            return
+        if self.journal.resumed:
+            self.emit(JournalResumed(self.journal.journal_path, len(self.journal.folders),
+                                     len(self.journal.ratings), len(self.journal.copied)))
+
+    def close_journal(self, completed):
+        if self.journal is None:
+            return
+        try:
+            self.journal.close(completed)
+        except Exception as e:
+            print(f"作業記録の保存エラー: {e}")
+        self.journal = None
+
+    def flush_rating_index(self):
+        if self.rating_index is None:
+            return
+        try:
+            self.rating_index.flush()
+        except Exception as e:
+            print(f"レーティングインデックス保存エラー: {e}")
+
+    def iter_select_batches(self, base_folder, io_slots=None, folder_number=None):
+        # セレクト側をフォルダ単位で読み、読み終えたフォルダから順に (フォルダ, [DirEntry, ...]) を返す
+        def on_walk_error(e):
+            self.emit(error_event("walk", e, role="select"))
+            print(f"os.scandir error: {e}")
+
+        batches = iter_folder_batches(base_folder, on_walk_error)
+        while True:
+            # I/Oの枠はフォルダを1つ読む間だけ使い、返した後の処理（レーティング待ちなど）の間は手放す
+            with io_slots or self.io_limiter.slots(base_folder), self.report.phase("list_select", folder_number):
+                batch = next(batches, None)
+            if batch is None:
+                return
+            yield batch
+    
+
+    def build_shoot_folder_index(self, base_folder):
+        # 年度フォルダを1回だけ走査し、撮影No.（先頭4桁）→候補フォルダの対応表を作る
+        def on_walk_error(e):
+            print(f"os.scandir error: {e}")
+        return ShootFolderIndex(base_folder, onerror=on_walk_error)
+
+    def find_folder_with_number(self, folder_index, target_number, image_presence):
+        # 撮影No.で始まり、ハイフンを含まず、画像を含む最初のフォルダを返す
+        def has_images(folder):
+            # 複数の撮影No.から同時に呼ばれるが、同じフォルダを2回調べることがあるだけで結果は変わらない
+            if folder not in image_presence:
+                with self.io_limiter.slots(folder):
+                    image_presence[folder] = contains_image_files(folder)
+            return image_presence[folder]
+        return folder_index.resolve(target_number, has_images)
+
+
+    def get_xmp_fields(self, image_path, sidecar_path=None):
+        # サイドカー（.xmp）がある場合はその内容で値が決まるため、記録もサイドカーのサイズと更新時刻で行う
+        rating_path = sidecar_path or image_path
+        # 前回から変更の無いファイルは作業記録またはレーティングインデックスから返す。
+        # 選択ルールを変えても使えるよう、記録には条件に使っていない値も含める
+        stat = None
+        journal = self.journal
+        if self.rating_index is not None or journal is not None:
+            try:
+                stat = os.stat(rating_path)
+                if journal is not None:
+                    fields = xmp_rating.decode_fields(journal.get_rating(rating_path, stat.st_size, stat.st_mtime_ns))
+                    if fields is not None:
+                        self.report.count("rating_journal_hits")
+                        return fields
+                if self.rating_index is not None:
+                    fields = xmp_rating.decode_fields(
+                        self.rating_index.get(rating_path, stat.st_size, stat.st_mtime_ns))
+                    if fields is not None:
+                        self.report.count("rating_index_hits")
+                        return fields
+            except Exception as e:
+                stat = None
+                print(f"rating index lookup error: {e}")
+
+        fields = None
+        if sidecar_path is not None:
+            self.report.count("rating_sidecar_reads")
+            fields = xmp_rating.read_sidecar_fields(sidecar_path)
+            if fields is None:
+                # サイドカーが読めない場合は画像に埋め込まれたXMPを使い、結果は記録しない
+                stat = None
+                if not file_types.is_rating_source(image_path):
+                    # 画像自体がレーティングを読めない形式の場合は読み込まない
+                    return {}
+        if fields is None:
+            fields = self.read_xmp_fields(image_path)
+        if fields is None:
+            # 読み取りエラーはインデックスに記録しない（値が無い＝レーティング0として扱う）
+            return {}
+        if stat is not None:
+            try:
+                value = xmp_rating.encode_fields(fields)
+                if journal is not None:
+                    journal.record_rating(rating_path, stat.st_size, stat.st_mtime_ns, value)
+                if self.rating_index is not None:
+                    self.rating_index.put(rating_path, stat.st_size, stat.st_mtime_ns, value)
+            except Exception as e:
+                print(f"rating index update error: {e}")
+        return fields
+
+    def read_xmp_fields(self, image_path):
+        # まずJPEGヘッダーのXMPパケットだけを読んで判定する（画像本体は読まない）
+        fields = xmp_rating.read_fields_fast(image_path)
+        if fields is not None:
+            return fields
+        # 判定できない場合のみ pyexiv2 で全メタデータを読む
+        self.report.count("rating_exiv2_fallbacks")
+        return self.get_xmp_fields_with_exiv2(image_path)
+
+    def get_xmp_fields_with_exiv2(self, image_path):
+        try:
+            # pyexiv2 はフォールバック時のみ読み込む（JPEGだけなら exiv2 が無い環境でも動作する）
+            import pyexiv2
+
+            # 日本語パスの問題を解決するため一時ファイルにコピー
+            # 拡張子は元のファイルに合わせる（RAW も読めるように）
+            with tempfile.NamedTemporaryFile(suffix=os.path.splitext(image_path)[1] or '.jpg', delete=False) as temp_file:
+                temp_path = temp_file.name
+            
+            # 元ファイルを一時ファイルにコピー
+            shutil.copy2(image_path, temp_path)
+            
+            try:
+                with self.exiv2_lock:
+                    # pyexiv2のログレベルを設定してSony1警告を抑制
+                    pyexiv2.set_log_level(4)  # エラーレベルのみ
+                    # HEIF / CR3（ISO BMFF）は既定では読めないため有効にする
+                    pyexiv2.enableBMFF()
+
+                    with pyexiv2.Image(temp_path) as set_image:
+                        xmp = set_image.read_xmp()
+                return xmp_rating.fields_from_exiv2(xmp)
+            finally:
+                # 一時ファイルを削除
+                try:
+                    os.unlink(temp_path)
+                except:
+                    pass
+                    
+        except Exception as e:
+            self.emit(error_event("rating", e, path=image_path, role="select"))
+        return None
+
+    # コピー処理の中で進捗情報を表示するたびに呼び出す
+    def copy_images(self, folder_numbers, source_folder1_path, source_folder2_path, destination_folder_path):
+        # 各ルートは1回だけ走査し、全ての撮影No.を同じ対応表から解決する
+        self.emit(FolderSearchStarted())
+        select_folder_index = studio_folder_index = None
+        # 作業記録のフォルダは1回だけ確認し、その結果で撮影No.ごとの処理も進める
+        # （途中で見えなくなった場合に、走査していない対応表で解決しようとしないようにする）
+        journal_folders = {}
+        if self.journal is not None:
+            journal_folders = {number: self.journal.get_folder(number) for number in folder_numbers}
+        # 全ての撮影No.のフォルダが作業記録にある場合はルートの走査を省く
+        if self.journal is None or any(folders is None for folders in journal_folders.values()):
+            # セレクト側と記念スタジオ側は別のPCにあるため、2つのルートは同時に走査する
+            with self.report.phase("folder_index"), ThreadPoolExecutor(max_workers=2) as executor:
+                select_future = executor.submit(self.build_shoot_folder_index, source_folder1_path)
+                studio_future = executor.submit(self.build_shoot_folder_index, source_folder2_path)
+                select_folder_index = select_future.result()
+                studio_folder_index = studio_future.result()
+        image_presence = {}
+
+        # 撮影No.ごとの検索・レーティング・コピーを number_workers 件まで同時に進める（開始は入力順）
+        workers = max(1, min(self.config.number_workers, len(folder_numbers)))
+        executor = ThreadPoolExecutor(max_workers=workers)
+        try:
+            futures = [
+                executor.submit(self.copy_folder_number, folder_number, journal_folders.get(folder_number),
+                                select_folder_index, studio_folder_index, image_presence, destination_folder_path)
+                for folder_number in folder_numbers
+            ]
+            wait(futures, return_when=FIRST_EXCEPTION)
+            for future in futures:
+                if future.done() and future.exception() is not None:
+                    # 1件でもエラーになった場合は他の撮影No.も中止し、全ての終了を待ってから送出する
+                    self.copy_in_progress = False
+                    wait(futures)
+                    raise future.exception()
+        finally:
+            executor.shutdown(wait=True)
+
+    def copy_folder_number(self, folder_number, resolved, select_folder_index, studio_folder_index, image_presence,
+                           destination_folder_path):
+        if not self.copy_in_progress:
+            return
+        with self.report.phase("number_total", folder_number):
+            self.copy_folder_number_in_progress(folder_number, resolved, select_folder_index, studio_folder_index,
+                                                image_presence, destination_folder_path)
+
+    def copy_folder_number_in_progress(self, folder_number, resolved, select_folder_index, studio_folder_index,
+                                       image_presence, destination_folder_path):
+        """ resolved は作業記録にある (セレクト側, 記念スタジオ側) のフォルダ。無ければ None。 """
+        report = self.report
+        journal = self.journal
+        if resolved is not None:
+            source_folder1, source_folder2 = resolved
+        else:
+            with report.phase("resolve", folder_number):
+                source_folder1 = self.find_folder_with_number(select_folder_index, folder_number, image_presence)
+                source_folder2 = self.find_folder_with_number(studio_folder_index, folder_number, image_presence)
+
+            if source_folder1 is None or source_folder2 is None:
+                self.emit(FolderNotFound(folder_number))
+                return
+            if journal is not None:
+                journal.record_folder(folder_number, source_folder1, source_folder2)
+
+        self.emit(FolderResolved(folder_number, source_folder1, source_folder2))
+
+        # スタジオ側を先に一覧化し、両方に存在するファイルだけをレーティング対象にする
+        with self.io_limiter.slots(source_folder2), report.phase("list_studio", folder_number):
+            studio_files = self.list_studio_files(source_folder2)
+        # セレクト側は一覧を読みながらレーティングを始める（件数は一覧を読み終えた時点で確定する）
+        listing = SelectListing(folder_number)
+        matched_files = self.iter_matched_files(source_folder1, studio_files, listing)
+        sidecars = listing.sidecars
+
+        processed_files = 0
+        selected_found = 0
+        journal_skipped = 0
+        journal_skipped_bytes = 0
+
+        # コピー先フォルダ（Studio側のフォルダ名を使用）
+        if self.config.use_temp_copy_folder:
+            copy_folder = os.path.join(self.get_temp_folder(), os.path.basename(source_folder2))
+        else:
+            copy_folder = os.path.join(destination_folder_path, os.path.basename(source_folder2))
+
+        with self.get_destination_lock(copy_folder):
+            # レーティング抽出（セレクトPC）とコピー（記念スタジオPC）を別スレッドで同時に進める
+            copier = ParallelCopier(
+                workers=self.config.copy_workers,
+                buffer_size=self.config.copy_buffer_size,
+                queue_size=self.config.copy_queue_size,
+                on_file_copied=lambda filename, nbytes, seconds:
+                    self.on_file_copied(folder_number, filename, nbytes, seconds),
+                on_bytes_copied=lambda filename, nbytes:
+                    self.emit(BytesCopied(folder_number, filename, nbytes)),
+                should_continue=lambda: self.copy_in_progress,
+                # 記念スタジオPCからの読み込みとメインPCへの書き込みの両方の枠を使う
+                io_slots=self.io_limiter.slots(source_folder2, copy_folder),
+                # 作業記録にはコピーしたファイルのハッシュも残す
+                hash_name="blake2b" if journal is not None else None,
+                on_file_committed=None if journal is None else
+                    lambda source_path, destination_path, nbytes, digest:
+                        journal.record_copied(folder_number, source_path, destination_path, nbytes, digest),
+                # 一時フォルダ経由の場合はコピー先が空のため比較しない
+                skip_identical=None if self.config.use_temp_copy_folder else self.config.skip_identical,
+                on_file_skipped=lambda filename, nbytes:
+                    self.on_file_skipped(folder_number, filename, nbytes, "identical"),
+                verify=self.config.verify,
+                on_verify_failed=lambda error: self.on_verify_failed(folder_number, error),
+            ).start()
+            try:
+                for image_path, fields in self.iter_xmp_fields(matched_files, folder_number, sidecars):
+                    if not copier.is_active():
+                        break
+
+                    processed_files += 1
+                    try:
+                        selected = self.rule.matches(fields)
+                    except RuleError as e:
+                        # 評価できない画像は選択しない
+                        self.emit(error_event("rule", e, path=image_path, role="select"))
+                        selected = False
+                    self.emit(FileRated(folder_number, image_path, fields.get("rating", "0"), selected,
+                                        processed_files, listing.total()))
+
+                    if selected:
+                        selected_found += 1
+                        # 大文字・小文字が異なる場合もあるため、コピー先には記念スタジオ側の実際のファイル名を使う
+                        corresponding_image = os.path.normpath(studio_files[filename_key(os.path.basename(image_path))])
+                        image_filename1 = os.path.basename(corresponding_image)
+                        destination_path = os.path.join(copy_folder, image_filename1)
+                        copied_size = journal.get_copied_size(destination_path) if journal is not None else None
+                        if copied_size is not None:
+                            # 前回の実行でコピーが完了している
+                            self.on_file_skipped(folder_number, image_filename1, copied_size, "journal")
+                            journal_skipped += 1
+                            journal_skipped_bytes += copied_size
+                            continue
+                        # コピー待ちが詰まっている時間（コピーが律速）を計る
+                        with report.phase("copy_queue_wait", folder_number):
+                            copier.submit(corresponding_image, copy_folder, image_filename1)
+            finally:
+                # キューに残ったコピーが終わるのを待つ（コピー中のエラーはここで送出される）
+                with report.phase("copy_finish_wait", folder_number):
+                    copier.finish()
+
+            copied_images = copier.copied_files
+
+            if not self.copy_in_progress:
+                return
+
+            if self.config.use_temp_copy_folder:
+                # 他の撮影No.が書き込み中の一時フォルダには触れない
+                with report.phase("temp_move", folder_number):
+                    self.move_temp_folder(os.path.basename(source_folder2), destination_folder_path)
+        number_done = NumberDone(folder_number, processed_files, selected_found, copied_images,
+                                 copier.copied_bytes, copier.elapsed, copier.skipped_files + journal_skipped,
+                                 copier.skipped_bytes + journal_skipped_bytes)
+        report.number_done(number_done)
+        self.emit(number_done)
+
+    def iter_matched_files(self, select_folder, studio_files, listing):
+        # セレクト側のファイルを見つけた順に照合し、レーティングを読む対象のパスを返す。
+        # サイドカーは同じフォルダの画像に対応するため、フォルダを1つ読み終えるごとに対応付ける
+        folder_number = listing.number
+        select_slots = self.io_limiter.slots(select_folder)
+        for _, entries in self.iter_select_batches(select_folder, select_slots, folder_number):
+            paths = [entry.path for entry in entries]
+            # Lightroom / Bridge のサイドカーは照合の対象にせず、対応する画像のレーティングに使う
+            sidecars = xmp_rating.find_sidecars(paths)
+            if sidecars:
+                listing.sidecars.update(sidecars)
+                paths = [path for path in paths if not xmp_rating.is_sidecar_filename(path)]
+            listing.select_files += len(paths)
+            for image_path in paths:
+                filename = os.path.basename(image_path)
+                if filename_key(filename) not in studio_files:
+                    listing.add_unmatched(filename)
+                    continue
+                # 動画や Thumbs.db などレーティングを読めない形式は読み込まずに除外する。
+                # サイドカーがあればその内容で判定できるため、形式を問わず対象にする
+                if image_path not in sidecars:
+                    kind = file_types.classify_extension(image_path)
+                    if kind is None:
+                        with select_slots:
+                            kind = file_types.sniff_kind(image_path)
+                    if kind not in file_types.RATING_KINDS:
+                        listing.unsupported += 1
+                        continue
+                listing.matched += 1
+                yield image_path
+        listing.completed = True
+        self.report.count("unsupported_files", listing.unsupported)
+        self.emit(FilesMatched(folder_number, listing.select_files, listing.matched + listing.unsupported,
+                               listing.unmatched_filenames, listing.unsupported, listing.unmatched))
+
+    def on_file_copied(self, folder_number, filename, nbytes, seconds):
+        # コピースレッドから呼ばれる
+        self.report.add_phase("copy", seconds, folder_number)
+        self.report.add_latency("copy", seconds)
+        self.report.count("copied_files")
+        self.report.count("copied_bytes", nbytes)
+        self.emit(FileCopied(folder_number, filename, nbytes, seconds))
+
+    def on_file_skipped(self, folder_number, filename, nbytes, reason):
+        self.report.count("skipped_files")
+        self.report.count("skipped_bytes", nbytes)
+        self.emit(FileSkipped(folder_number, filename, nbytes, reason))
+
+    def on_verify_failed(self, folder_number, error):
+        try:
+            self.verify_manifest.record(folder_number, error)
+        except Exception as e:
+            print(f"検証結果の記録エラー: {e}")
+        self.emit(error_event("verify", error, path=error.destination_path, role="main"))
+
+    def get_destination_lock(self, copy_folder):
+        with self.destination_locks_lock:
+            return self.destination_locks.setdefault(os.path.normcase(os.path.abspath(copy_folder)), threading.Lock())
+
+    def iter_xmp_fields(self, image_paths, folder_number=None, sidecars=None):
+        # XMPの値の抽出をスレッドプールで先行して実行し、(パス, 値の辞書) を元の順序で返す
+        workers = max(1, self.config.rating_workers)
+        report = self.report
+        paths = iter(image_paths)
+        pending = collections.deque()
+        executor = ThreadPoolExecutor(max_workers=workers)
+        try:
+            # 先読みは並列数の2倍までに制限する
+            for image_path in itertools.islice(paths, workers * 2):
+                pending.append((image_path, executor.submit(self.rate_image, image_path, folder_number,
+                                                            sidecars.get(image_path) if sidecars else None)))
+            while pending:
+                if not self.copy_in_progress:
+                    return
+                image_path, future = pending.popleft()
+                # 抽出結果を待っている時間（レーティング抽出が律速）を計る
+                with report.phase("rating_wait", folder_number):
+                    fields = future.result()
+                next_path = next(paths, None)
+                if next_path is not None:
+                    pending.append((next_path, executor.submit(self.rate_image, next_path, folder_number,
+                                                               sidecars.get(next_path) if sidecars else None)))
+                yield image_path, fields
+        finally:
+            # 中止時は未着手の抽出を取り消し、実行中のものの完了は待たない
+            for _, future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    def rate_image(self, image_path, folder_number=None, sidecar_path=None):
+        # 同時I/O数の上限は他の撮影No.のレーティング抽出・コピーと共有する
+        with self.io_limiter.slots(image_path), self.report.latency("rating", folder_number):
+            self.report.count("rated_files")
+            return self.get_xmp_fields(image_path, sidecar_path)
+
+    def list_studio_files(self, studio_folder):
+        # 記念スタジオ側フォルダ（サブフォルダを含む）のファイル名→パスの対応表を1回の走査で作成
+        def on_walk_error(e):
+            self.emit(error_event("walk", e, role="studio"))
+            print(f"os.scandir error: {e}")
+
+        studio_files, duplicates = build_basename_index(studio_folder, on_walk_error)
+        if duplicates:
+            # 同名ファイルが複数ある場合は最初に見つかったものを使う
+            self.emit(DuplicateFilesFound(studio_folder, duplicates))
+        return studio_files
+
+    def get_temp_folder(self):
+        # アプリケーションの実行ディレクトリを取得
+        app_directory = os.path.dirname(__file__)
+
+        # 一時フォルダを返す
+        return os.path.join(app_directory, "temp_copy_folder")
+
+    def move_temp_folder(self, temp_subfolder, destination_folder_path):
+        # 一時フォルダ内の1つのサブフォルダをコピー先フォルダへ移動
+        temp_subfolder_path = os.path.join(self.get_temp_folder(), temp_subfolder)
+        if os.path.exists(temp_subfolder_path) and os.path.isdir(temp_subfolder_path):
+            destination_subfolder = os.path.join(destination_folder_path, temp_subfolder)
+            os.makedirs(destination_subfolder, exist_ok=True)
+            for file in os.listdir(temp_subfolder_path):
+                file_path = os.path.join(temp_subfolder_path, file)
+                if os.path.isfile(file_path):
+                    destination_path = os.path.join(destination_subfolder, file)
+                    shutil.move(file_path, destination_path)
+            os.rmdir(temp_subfolder_path)  # 一時フォルダを削除
@@ -0,0 +1,52 @@
+"""
+CopyEngine が通知する進捗イベント。
+
+GUI・コマンドライン・計測用スクリプトは同じイベントを受け取り、
+それぞれ表示用の文章やJSONに変換する。
+"""
+from collections import namedtuple
+
+# selection_rule: コピーする画像を選ぶ条件（selection_rule.py）
+RunStarted = namedtuple("RunStarted", "folder_numbers selection_rule")
+FolderCheckStarted = namedtuple("FolderCheckStarted", "")
+FolderSearchStarted = namedtuple("FolderSearchStarted", "")
+FolderResolved = namedtuple("FolderResolved", "number select_folder studio_folder")
+FolderNotFound = namedtuple("FolderNotFound", "number")
+# セレクト側の一覧を読み終えた時点で通知する（レーティングは一覧を読みながら始まっている）
+# unmatched: 記念スタジオ側に同名ファイルが無いセレクト側のファイル数、unmatched_filenames: そのファイル名（先頭100件まで）
+# unsupported: 一致したファイルのうち、レーティングを読めない形式のため除外したファイル数（file_types.py）
+FilesMatched = namedtuple("FilesMatched", "number select_files matched unmatched_filenames unsupported unmatched")
+# duplicates: {ファイル名: [パス, ...]}（先頭のパスが採用される）
+DuplicateFilesFound = namedtuple("DuplicateFilesFound", "studio_folder duplicates")
+# selected: 選択ルールに合い、コピーの対象になった
+# total: レーティングを読む対象の件数（セレクト側の一覧を読み終えるまでは None）
+FileRated = namedtuple("FileRated", "number path rating selected processed total")
+# コピー中のファイルのバッファ1回分の転送量
+BytesCopied = namedtuple("BytesCopied", "number filename bytes")
+FileCopied = namedtuple("FileCopied", "number filename bytes seconds")
+# reason: "journal"（前回の実行でコピー済み）/ "identical"（コピー先に同じファイルがある）
+FileSkipped = namedtuple("FileSkipped", "number filename bytes reason")
+# selected: 選択ルールに合ったファイル数、skipped / skipped_bytes: コピー済みのためコピーを省いたファイル数とバイト数
+NumberDone = namedtuple("NumberDone", "number rated selected copied bytes seconds skipped skipped_bytes")
+# 前回中断された実行の記録が見つかった（copied: コピー済みとして記録されたファイル数）
+JournalResumed = namedtuple("JournalResumed", "path folders ratings copied")
+# kind: "folder_access" / "walk" / "rating" / "rule" / "copy" / "verify" / "run"、role: "select" / "studio" / "main" / None
+ErrorOccurred = namedtuple("ErrorOccurred", "kind role path message errno")
+# 実行レポート（run_report.py）を保存した
+ReportWritten = namedtuple("ReportWritten", "path")
+# status: "done" / "cancelled" / "error"
+RunFinished = namedtuple("RunFinished", "status")
+
+RUN_DONE = "done"
+RUN_CANCELLED = "cancelled"
+RUN_ERROR = "error"
+
+
+def event_to_dict(event):
+    record = {"event": type(event).__name__}
+    record.update(event._asdict())
+    return record
+
+
+def error_event(kind, error, path=None, role=None):
+    return ErrorOccurred(kind, role, path or getattr(error, "filename", None), str(error), getattr(error, "errno", None))
@@ -0,0 +1,281 @@
+"""
+メインPCへのファイルコピー。
+
+コピー先には一旦 <ファイル名>.partial として書き込み、完了後にリネームする。
+途中で中断されても、書きかけのファイルが正式な名前で残ることはない。
+"""
+import contextlib
+import hashlib
+import os
+import queue
+import shutil
+import threading
+import time
+
+PARTIAL_SUFFIX = ".partial"
+# SMB越しでは既定のバッファ（Windowsで1MB）では回線を使い切れないため大きめにする
+DEFAULT_BUFFER_SIZE = 4 * 1024 * 1024
+# コピー先に同じファイルがある場合にコピーを省く判定方法
+SKIP_SIZE_MTIME = "size_mtime"
+SKIP_HASH = "hash"
+# FAT/exFAT の更新時刻は2秒単位のため、それ未満の差は同じ時刻とみなす
+MTIME_TOLERANCE_NS = 2 * 1000 * 1000 * 1000
+# コピー内容の確認方法
+# VERIFY_SYNC: 書き込み後に fsync し、OSにディスクへの書き込み完了を保証させるだけ（内容は比べない。ハッシュも計算しない）
+# VERIFY_READBACK: さらにコピー先を1回だけ読み直し、コピー元のハッシュと比べる
+VERIFY_SYNC = "sync"
+VERIFY_READBACK = "readback"
+VERIFY_HASH_NAME = "blake2b"
+
+
+class VerificationError(Exception):
+    """ コピー先を読み直したハッシュがコピー元と一致しない。 """
+
+    def __init__(self, source_path, destination_path, expected, actual):
+        super().__init__(f"hash mismatch: {destination_path}")
+        self.source_path = source_path
+        self.destination_path = destination_path
+        self.expected = expected
+        self.actual = actual
+
+
+def copy_stream(source_path, destination_path, buffer_size, progress=None, hasher=None, sync=False):
+    """
+    指定サイズのバッファで読み書きし、コピーしたバイト数を返す。hasher には読んだデータをそのまま渡す。
+    sync=True の場合は閉じる前に fsync する。
+    """
+    copied = 0
+    buffer = bytearray(buffer_size)
+    view = memoryview(buffer)
+    with open(source_path, "rb", buffering=0) as src, open(destination_path, "wb", buffering=0) as dst:
+        while True:
+            n = src.readinto(buffer)
+            if not n:
+                break
+            written = 0
+            while written < n:
+                written += dst.write(view[written:n])
+            if hasher is not None:
+                hasher.update(view[:n])
+            copied += n
+            if progress is not None:
+                progress(n)
+        if sync:
+            os.fsync(dst.fileno())
+    return copied
+
+
+def hash_file(path, hash_name="blake2b", buffer_size=DEFAULT_BUFFER_SIZE):
+    hasher = hashlib.new(hash_name)
+    buffer = bytearray(buffer_size)
+    view = memoryview(buffer)
+    with open(path, "rb", buffering=0) as f:
+        while True:
+            n = f.readinto(buffer)
+            if not n:
+                break
+            hasher.update(view[:n])
+    return hasher.hexdigest()
+
+
+def is_identical(source_path, destination_path, mode=SKIP_SIZE_MTIME):
+    """
+    コピー先に同じ内容のファイルが既にあれば True を返す。
+    SKIP_SIZE_MTIME はサイズと更新時刻だけを比べ、SKIP_HASH はサイズが同じ場合に両方の内容を読んで比べる。
+    """
+    try:
+        destination_stat = os.stat(destination_path)
+    except FileNotFoundError:
+        return False
+    source_stat = os.stat(source_path)
+    if source_stat.st_size != destination_stat.st_size:
+        return False
+    if mode == SKIP_HASH:
+        return hash_file(source_path) == hash_file(destination_path)
+    return abs(source_stat.st_mtime_ns - destination_stat.st_mtime_ns) < MTIME_TOLERANCE_NS
+
+
+def copy_file_atomic(source_path, destination_path, buffer_size=None, progress=None, hasher=None,
+                     preserve_mtime=False, verify=None):
+    """
+    .partial に書き込んでからリネームする。コピーしたバイト数を返す。
+    progress(バイト数) はバッファ1回分を書き込むごとに呼ばれる。
+    hasher（hashlib のオブジェクト）を渡すとコピーと同じ読み込みでハッシュも計算する。
+    preserve_mtime=True の場合はコピー元の更新時刻を引き継ぐ（次回の is_identical() の判定に使う）。
+    verify（VERIFY_SYNC / VERIFY_READBACK）を指定すると書き込みを fsync し、VERIFY_READBACK では
+    リネーム前に .partial を読み直して hasher の値と比べる。一致しない場合は VerificationError を送出する。
+    """
+    partial_path = destination_path + PARTIAL_SUFFIX
+    if verify == VERIFY_READBACK and hasher is None:
+        hasher = hashlib.new(VERIFY_HASH_NAME)
+    if (hasher is not None or verify) and not buffer_size:
+        buffer_size = DEFAULT_BUFFER_SIZE
+    try:
+        if buffer_size:
+            copied = copy_stream(source_path, partial_path, buffer_size, progress, hasher, sync=bool(verify))
+        else:
+            shutil.copyfile(source_path, partial_path)
+            copied = os.path.getsize(partial_path)
+            if progress is not None:
+                progress(copied)
+        if preserve_mtime:
+            source_stat = os.stat(source_path)
+            os.utime(partial_path, ns=(source_stat.st_atime_ns, source_stat.st_mtime_ns))
+        if verify == VERIFY_READBACK:
+            # コピー元はコピー中の1回しか読まないため、追加の読み込みはコピー先の1回だけになる
+            expected = hasher.hexdigest()
+            actual = hash_file(partial_path, hasher.name, buffer_size)
+            if actual != expected:
+                raise VerificationError(source_path, destination_path, expected, actual)
+        # 同一ボリューム内のリネームなので置き換えは一瞬で完了する
+        os.replace(partial_path, destination_path)
+    except BaseException:
+        try:
+            os.unlink(partial_path)
+        except OSError:
+            pass
+        raise
+    return copied
+
+
+class ParallelCopier:
+    """
+    複数のファイルを同時にコピーする。
+    submit() で渡したファイルを workers 本のスレッドが並行してコピーし、
+    finish() で全ての完了を待つ。最初に発生したエラーは finish() で再送出する。
+    """
+
+    def __init__(self, workers=4, buffer_size=DEFAULT_BUFFER_SIZE, queue_size=32,
+                 on_file_copied=None, on_bytes_copied=None, should_continue=None, io_slots=None,
+                 hash_name=None, on_file_committed=None, skip_identical=None, on_file_skipped=None,
+                 verify=None, on_verify_failed=None):
+        self.workers = max(1, workers)
+        self.buffer_size = buffer_size
+        # 複数の ParallelCopier やレーティング抽出と共有する同時I/O数の制限（セマフォ）
+        self.io_slots = io_slots
+        # hash_name（"blake2b" など）を指定すると、コピーしながらハッシュを計算して
+        # on_file_committed(コピー元, コピー先, バイト数, ハッシュ) に渡す（ハッシュ無しの場合は None）
+        self.hash_name = hash_name
+        self.on_file_committed = on_file_committed
+        # skip_identical（SKIP_SIZE_MTIME / SKIP_HASH）を指定すると、コピー先に同じファイルがある場合は
+        # コピーせずに on_file_skipped(ファイル名, バイト数) を呼ぶ。コピーしたファイルは更新時刻を引き継ぐ
+        self.skip_identical = skip_identical
+        self.on_file_skipped = on_file_skipped
+        # verify（VERIFY_SYNC / VERIFY_READBACK）を指定すると書き込みを確定させ、VERIFY_READBACK では内容も比べる。
+        # 一致しなかったファイルは on_verify_failed(VerificationError) を呼んで次のファイルへ進む
+        self.verify = verify
+        self.on_verify_failed = on_verify_failed
+        if verify == VERIFY_READBACK and not hash_name:
+            self.hash_name = VERIFY_HASH_NAME
+        # on_file_copied(ファイル名, バイト数, 秒数) と on_bytes_copied(ファイル名, バイト数) はコピースレッドから呼ばれる
+        self.on_file_copied = on_file_copied
+        self.on_bytes_copied = on_bytes_copied
+        self.should_continue = should_continue
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.lock = threading.Lock()
+        self.threads = []
+        self.error = None
+        self.copied_files = 0
+        self.copied_bytes = 0
+        self.skipped_files = 0
+        self.skipped_bytes = 0
+        self.verify_failed_files = 0
+        # 作成済みのコピー先フォルダ。メインPCへの問い合わせをファイルごとに行わないようにする
+        self.created_folders = set()
+        self.started_at = None
+        self.finished_at = None
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        for _ in range(self.workers):
+            thread = threading.Thread(target=self._run, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        return self
+
+    def submit(self, source_path, destination_folder, filename):
+        """ コピー待ちが上限に達している場合は空くまで待つ。 """
+        self.queue.put((source_path, destination_folder, filename))
+
+    def finish(self):
+        for _ in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+        self.finished_at = time.perf_counter()
+        if self.error is not None:
+            raise self.error
+
+    def is_active(self):
+        if self.error is not None:
+            return False
+        return self.should_continue is None or self.should_continue()
+
+    @property
+    def elapsed(self):
+        if self.started_at is None:
+            return 0.0
+        end = self.finished_at if self.finished_at is not None else time.perf_counter()
+        return end - self.started_at
+
+    @property
+    def bytes_per_second(self):
+        elapsed = self.elapsed
+        return self.copied_bytes / elapsed if elapsed > 0 else 0.0
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            # 中止やエラーの後は残りを読み捨てる
+            if not self.is_active():
+                continue
+            source_path, destination_folder, filename = item
+            try:
+                if destination_folder not in self.created_folders:
+                    # 複数のスレッドが同時に作成しても exist_ok で問題ない
+                    os.makedirs(destination_folder, exist_ok=True)
+                    with self.lock:
+                        self.created_folders.add(destination_folder)
+                progress = None
+                if self.on_bytes_copied is not None:
+                    progress = lambda nbytes, filename=filename: self.on_bytes_copied(filename, nbytes)
+                destination_path = os.path.join(destination_folder, filename)
+                hasher = hashlib.new(self.hash_name) if self.hash_name else None
+                # 転送速度は空き待ちを除いた実際のコピー時間で計る
+                with self.io_slots if self.io_slots is not None else contextlib.nullcontext():
+                    if self.skip_identical and is_identical(source_path, destination_path, self.skip_identical):
+                        skipped = os.path.getsize(destination_path)
+                        with self.lock:
+                            self.skipped_files += 1
+                            self.skipped_bytes += skipped
+                        if self.on_file_skipped is not None:
+                            self.on_file_skipped(filename, skipped)
+                        continue
+                    started = time.perf_counter()
+                    try:
+                        copied = copy_file_atomic(source_path, destination_path, self.buffer_size, progress, hasher,
+                                                  preserve_mtime=bool(self.skip_identical), verify=self.verify)
+                    except VerificationError as e:
+                        # 壊れたコピーは .partial のまま削除済みなので、記録して次のファイルへ進む
+                        with self.lock:
+                            self.verify_failed_files += 1
+                        if self.on_verify_failed is not None:
+                            self.on_verify_failed(e)
+                        continue
+                    seconds = time.perf_counter() - started
+                with self.lock:
+                    self.copied_files += 1
+                    self.copied_bytes += copied
+                if self.on_file_committed is not None:
+                    self.on_file_committed(source_path, destination_path, copied,
+                                           hasher.hexdigest() if hasher is not None else None)
+                if self.on_file_copied is not None:
+                    self.on_file_copied(filename, copied, seconds)
+            except Exception as e:
+                # スレッドが止まると submit() が待ち続けるため、例外は必ずここで受け止める
+                with self.lock:
+                    if self.error is None:
+                        self.error = e
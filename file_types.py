@@ -0,0 +1,75 @@
+"""
+レーティングを読む前にファイルの形式を判定する。
+
+セレクト側フォルダには JPEG 以外に RAW・動画・Thumbs.db なども置かれる。
+レーティングを読めない形式のファイルは、読み込み（pyexiv2 用の一時コピーを含む）を行わずに除外する。
+拡張子で判断できる場合はファイルを開かず、拡張子が無い・不明な場合だけ先頭の数バイトを読んで判定する。
+"""
+import os
+
+KIND_JPEG = "jpeg"
+# pyexiv2 で読める RAW・TIFF・PNG・HEIF（HEIF / CR3 は pyexiv2.enableBMFF() を有効にして読む）
+KIND_EXIV2 = "exiv2"
+KIND_UNSUPPORTED = "unsupported"
+
+# レーティングを読む対象にする形式
+RATING_KINDS = (KIND_JPEG, KIND_EXIV2)
+
+EXTENSION_KINDS = {
+    ".jpg": KIND_JPEG, ".jpeg": KIND_JPEG, ".jpe": KIND_JPEG,
+    ".tif": KIND_EXIV2, ".tiff": KIND_EXIV2, ".png": KIND_EXIV2,
+    ".cr2": KIND_EXIV2, ".nef": KIND_EXIV2, ".nrw": KIND_EXIV2, ".arw": KIND_EXIV2, ".srf": KIND_EXIV2,
+    ".sr2": KIND_EXIV2, ".dng": KIND_EXIV2, ".pef": KIND_EXIV2, ".orf": KIND_EXIV2, ".rw2": KIND_EXIV2,
+    ".raf": KIND_EXIV2, ".srw": KIND_EXIV2,
+    ".cr3": KIND_EXIV2, ".heic": KIND_EXIV2, ".heif": KIND_EXIV2, ".hif": KIND_EXIV2,
+    ".mp4": KIND_UNSUPPORTED, ".mov": KIND_UNSUPPORTED, ".avi": KIND_UNSUPPORTED, ".mts": KIND_UNSUPPORTED,
+    ".m2ts": KIND_UNSUPPORTED, ".mpg": KIND_UNSUPPORTED, ".wmv": KIND_UNSUPPORTED, ".mkv": KIND_UNSUPPORTED,
+    ".3gp": KIND_UNSUPPORTED, ".wav": KIND_UNSUPPORTED, ".mp3": KIND_UNSUPPORTED,
+    ".db": KIND_UNSUPPORTED, ".ini": KIND_UNSUPPORTED, ".txt": KIND_UNSUPPORTED, ".lnk": KIND_UNSUPPORTED,
+    ".xmp": KIND_UNSUPPORTED, ".tmp": KIND_UNSUPPORTED, ".partial": KIND_UNSUPPORTED,
+}
+
+SNIFF_SIZE = 16
+# 先頭のバイト列 → 形式（先に一致したものを使う）
+MAGIC_KINDS = (
+    (b"\xff\xd8\xff", KIND_JPEG),
+    (b"II*\x00", KIND_EXIV2),
+    (b"MM\x00*", KIND_EXIV2),
+    # Olympus ORF / Panasonic RW2
+    (b"IIRO", KIND_EXIV2),
+    (b"IIRS", KIND_EXIV2),
+    (b"IIU\x00", KIND_EXIV2),
+    (b"FUJIFILMCCD-RAW", KIND_EXIV2),
+    (b"\x89PNG\r\n\x1a\n", KIND_EXIV2),
+)
+# ISO BMFF（先頭4バイトの後に "ftyp" とブランドが続く）のうち exiv2 で読めるもの。
+# MP4 / MOV も同じ構造のため、ブランドで区別する
+BMFF_BRANDS = {b"heic", b"heix", b"heim", b"heis", b"hevc", b"hevx", b"mif1", b"msf1", b"crx "}
+
+
+def classify_extension(path):
+    """ 拡張子だけで判定する。判断できない場合は None。 """
+    return EXTENSION_KINDS.get(os.path.splitext(path)[1].lower())
+
+
+def sniff_kind(path):
+    """ 先頭の数バイトで判定する。読めない場合は KIND_UNSUPPORTED。 """
+    try:
+        with open(path, "rb") as f:
+            head = f.read(SNIFF_SIZE)
+    except OSError:
+        return KIND_UNSUPPORTED
+    for magic, kind in MAGIC_KINDS:
+        if head.startswith(magic):
+            return kind
+    if head[4:8] == b"ftyp" and head[8:12] in BMFF_BRANDS:
+        return KIND_EXIV2
+    return KIND_UNSUPPORTED
+
+
+def classify_file(path):
+    return classify_extension(path) or sniff_kind(path)
+
+
+def is_rating_source(path):
+    return classify_file(path) in RATING_KINDS
@@ -0,0 +1,141 @@
+"""
+フォルダ探索用のユーティリティ。
+
+年度フォルダを1回だけ走査して撮影No.→候補フォルダの対応表を作り、
+入力された複数の撮影No.をまとめて解決する。
+"""
+import os
+
+# 撮影No.は4桁で入力される
+NUMBER_PREFIX_LENGTH = 4
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg')
+
+
+def is_hidden_name(name):
+    return name.startswith('.')
+
+
+def _is_dir(entry):
+    # 種別が分からない共有フォルダでは stat が必要になり、走査中に消えたものは OSError になる
+    try:
+        return entry.is_dir()
+    except OSError:
+        return False
+
+
+def iter_folder_batches(folder, onerror=None, enter_folder=None, include_empty=False):
+    """
+    os.walk と同じ順序（フォルダ内のファイル→サブフォルダを深さ優先）で、
+    フォルダごとに (フォルダのパス, [ファイルの DirEntry, ...]) を返す。
+    ディレクトリ一覧に含まれる種別情報を使うため、ファイルごとの stat は発生しない。
+    1つのフォルダを読み終えるたびに返すため、ツリー全体の一覧を待たずに処理を始められる。
+    サイドカーのように同じフォルダ内の他のファイルと対応付ける処理は、フォルダ単位で行える。
+    enter_folder(サブフォルダの DirEntry) が False を返したフォルダは、その下も含めて読まない。
+    include_empty=True の場合はファイルの無いフォルダも (フォルダのパス, []) として返す。
+    """
+    stack = [folder]
+    while stack:
+        current = stack.pop()
+        files = []
+        subfolders = []
+        try:
+            with os.scandir(current) as it:
+                for entry in it:
+                    if _is_dir(entry):
+                        # 隠しフォルダとシンボリックリンク先は辿らない（os.walk の既定と同じ）
+                        if not is_hidden_name(entry.name) and not entry.is_symlink():
+                            if enter_folder is None or enter_folder(entry):
+                                subfolders.append(entry.path)
+                    elif not entry.name.startswith('.DS_Store'):
+                        files.append(entry)
+        except OSError as e:
+            if onerror is not None:
+                onerror(e)
+            continue
+        stack.extend(reversed(subfolders))
+        if files or include_empty:
+            yield current, files
+
+
+def iter_file_entries(folder, onerror=None):
+    """ iter_folder_batches() と同じ順序でファイルの DirEntry を1件ずつ返す。 """
+    for _, entries in iter_folder_batches(folder, onerror):
+        yield from entries
+
+
+def is_image_filename(name):
+    return name.lower().endswith(IMAGE_EXTENSIONS)
+
+
+def contains_image_files(folder, onerror=None):
+    """ 最初のJPEGが見つかった時点で走査を打ち切る。 """
+    for entry in iter_file_entries(folder, onerror):
+        if is_image_filename(entry.name):
+            return True
+    return False
+
+
+def filename_key(name):
+    """ ファイル名の照合に使うキー。Windows の共有フォルダと同じく大文字・小文字を区別しない。 """
+    return os.path.normcase(name).lower()
+
+
+def build_basename_index(folder, onerror=None):
+    """
+    サブフォルダを含めてファイル名→パスの対応表を作る。キーは filename_key() で、値は実際のパス。
+    同じファイル名が複数ある場合は走査順で最初に見つかったもの（直下のファイルが優先）を採用し、
+    重複分は {ファイル名: [パス, ...]} として別に返す。
+    """
+    index = {}
+    duplicates = {}
+    for entry in iter_file_entries(folder, onerror):
+        key = filename_key(entry.name)
+        first_path = index.setdefault(key, entry.path)
+        if first_path != entry.path:
+            duplicates.setdefault(os.path.basename(first_path), [first_path]).append(entry.path)
+    return index, duplicates
+
+
+class ShootFolderIndex:
+    def __init__(self, base_folder, onerror=None):
+        self.base_folder = base_folder
+        self.onerror = onerror
+        # 先頭4文字 → [(フォルダ名, パス), ...]（走査順＝深さ優先の先行順）
+        self.candidates = {}
+        self.ordered_candidates = []
+        self.folder_count = 0
+        self.build()
+
+    def build(self):
+        self.candidates.clear()
+        self.ordered_candidates.clear()
+        self.folder_count = 0
+        # ファイルの一覧と同じ走査（隠しフォルダとシンボリックリンクは対象外）で、深さ優先の先行順に並べる
+        for folder, _ in iter_folder_batches(self.base_folder, self.onerror, include_empty=True):
+            if folder == self.base_folder:
+                continue
+            self.folder_count += 1
+            name = os.path.basename(folder)
+            # ハイフンを含むフォルダは対象外（従来と同じ条件）
+            if '-' not in name:
+                candidate = (name, folder)
+                self.candidates.setdefault(name[:NUMBER_PREFIX_LENGTH], []).append(candidate)
+                self.ordered_candidates.append(candidate)
+
+    def iter_candidates(self, target_number):
+        if len(target_number) >= NUMBER_PREFIX_LENGTH:
+            candidates = self.candidates.get(target_number[:NUMBER_PREFIX_LENGTH], [])
+        else:
+            candidates = self.ordered_candidates
+        for name, path in candidates:
+            if name.startswith(target_number):
+                yield path
+
+    def resolve(self, target_number, has_images):
+        """ 撮影No.で始まり、画像を含む最初のフォルダを返す。見つからなければ None。 """
+        if not target_number:
+            return None
+        for path in self.iter_candidates(target_number):
+            if has_images(path):
+                return path
+        return None
@@ -0,0 +1,93 @@
+"""
+同時I/O数の制限。
+
+全体の上限（io_limit）に加えて、ファイルサーバー（ホスト）ごとの上限を設ける。
+セレクトPCと記念スタジオPCは別のマシンのため、片方の応答が遅い間に
+全体の枠をそのホストへの読み込みだけで使い切らないようにする。
+"""
+import functools
+import os
+import threading
+
+LOCAL_HOST = "local"
+
+
+@functools.lru_cache(maxsize=1024)
+def _mount_point(folder):
+    # UNCパスもドライブも無い環境（Linux / macOS のマウント）ではマウントポイントをホストとみなす
+    while not os.path.ismount(folder):
+        parent = os.path.dirname(folder)
+        if parent == folder:
+            break
+        folder = parent
+    return folder
+
+
+def host_of(path):
+    """
+    path が置かれているホストを返す。
+    \\\\server\\share\\... は server、Z:\\... は Z:、それ以外はマウントポイント（ルートなら "local"）。
+    """
+    path = os.path.abspath(path)
+    drive = os.path.splitdrive(path)[0]
+    if drive[:2] in ("\\\\", "//"):
+        return drive[2:].replace("/", "\\").split("\\")[0].lower()
+    if drive:
+        return drive.upper()
+    mount_point = _mount_point(os.path.dirname(path))
+    return LOCAL_HOST if mount_point == os.sep else mount_point
+
+
+class IOSlots:
+    """
+    複数のセマフォをまとめて取得する。with で使い、スレッド間で共有できる。
+    取得順は IOLimiter が決めた順（ホスト名順→全体）で固定し、待ち合いによる停止を防ぐ。
+    """
+
+    def __init__(self, semaphores):
+        self.semaphores = semaphores
+
+    def __enter__(self):
+        acquired = []
+        try:
+            for semaphore in self.semaphores:
+                semaphore.acquire()
+                acquired.append(semaphore)
+        except BaseException:
+            for semaphore in reversed(acquired):
+                semaphore.release()
+            raise
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        for semaphore in reversed(self.semaphores):
+            semaphore.release()
+        return False
+
+
+class IOLimiter:
+    def __init__(self, total_limit, host_limit=None):
+        self.total = threading.BoundedSemaphore(max(1, total_limit))
+        # None の場合はホストごとの上限を設けない
+        self.host_limit = host_limit
+        self.lock = threading.Lock()
+        self.host_semaphores = {}
+        self.slots_cache = {}
+        self.any_host = IOSlots([self.total])
+
+    def slots(self, *paths):
+        """ paths（読み込み元・書き込み先）のホストの枠と全体の枠を取得する IOSlots を返す。 """
+        if not self.host_limit:
+            return self.any_host
+        hosts = tuple(sorted({host_of(path) for path in paths if path}))
+        with self.lock:
+            slots = self.slots_cache.get(hosts)
+            if slots is None:
+                semaphores = []
+                for host in hosts:
+                    semaphore = self.host_semaphores.get(host)
+                    if semaphore is None:
+                        semaphore = self.host_semaphores[host] = threading.BoundedSemaphore(max(1, self.host_limit))
+                    semaphores.append(semaphore)
+                slots = self.slots_cache[hosts] = IOSlots(semaphores + [self.total])
+            return slots
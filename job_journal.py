@@ -0,0 +1,148 @@
+"""
+コピー処理の作業記録（ジャーナル）。
+
+同じ撮影No.・同じフォルダで再実行したときに、前回の続きから処理できるように
+解決したフォルダ・抽出済みのレーティング・コピー済みのファイルを1行1件のJSONで追記する。
+書き込みは追記のみで、fsync はまとめて行う。途中で強制終了された場合も、
+最後の書きかけの行を読み飛ばすだけで残りの記録は使える。
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+JOURNAL_FOLDER_NAME = "journals"
+
+
+def journal_key(folder_numbers, source_folder1_path, source_folder2_path, destination_folder_path):
+    # 撮影No.の入力順は問わない
+    key = json.dumps([sorted(set(folder_numbers)), source_folder1_path, source_folder2_path, destination_folder_path],
+                     ensure_ascii=False)
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+
+class JobJournal:
+    def __init__(self, journal_path, sync_every=200, sync_interval=2.0):
+        self.journal_path = journal_path
+        # sync_every 件ごと、または sync_interval 秒ごとに fsync する
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.lock = threading.Lock()
+        # 撮影No. → (セレクト側フォルダ, 記念スタジオ側フォルダ)
+        self.folders = {}
+        # 正規化したパス → (サイズ, 更新時刻, レーティング)
+        self.ratings = {}
+        # 正規化したコピー先パス → (サイズ, ハッシュ)
+        self.copied = {}
+        self.resumed = False
+        self.load()
+        os.makedirs(os.path.dirname(journal_path) or ".", exist_ok=True)
+        self.file = open(journal_path, "a", encoding="utf-8")
+        self.unsynced = 0
+        self.last_sync = time.monotonic()
+
+    @staticmethod
+    def normalize_path(path):
+        return os.path.normcase(os.path.abspath(path))
+
+    def load(self):
+        valid_size = 0
+        try:
+            with open(self.journal_path, "rb") as f:
+                for line in f:
+                    # 改行で終わっていない行は強制終了時の書きかけなので、それ以降は使わない
+                    if not line.endswith(b"\n"):
+                        break
+                    try:
+                        record = json.loads(line.decode("utf-8"))
+                    except ValueError:
+                        break
+                    self.apply(record)
+                    self.resumed = True
+                    valid_size += len(line)
+                truncated = f.tell() != valid_size
+        except FileNotFoundError:
+            return
+        if truncated:
+            # 続けて追記する行が書きかけの行とつながらないよう切り詰める
+            with open(self.journal_path, "r+b") as f:
+                f.truncate(valid_size)
+
+    def apply(self, record):
+        kind = record.get("type")
+        if kind == "folder":
+            self.folders[record["number"]] = (record["select"], record["studio"])
+        elif kind == "rating":
+            self.ratings[self.normalize_path(record["path"])] = (record["size"], record["mtime_ns"], record["rating"])
+        elif kind == "copied":
+            self.copied[self.normalize_path(record["dest"])] = (record["size"], record.get("hash"))
+
+    def append(self, record):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self.lock:
+            self.apply(record)
+            if self.file is None:
+                return
+            self.file.write(line)
+            self.unsynced += 1
+            if self.unsynced >= self.sync_every or time.monotonic() - self.last_sync >= self.sync_interval:
+                self._sync_locked()
+
+    def _sync_locked(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.unsynced = 0
+        self.last_sync = time.monotonic()
+
+    def record_folder(self, number, select_folder, studio_folder):
+        if self.folders.get(number) == (select_folder, studio_folder):
+            return
+        self.append({"type": "folder", "number": number, "select": select_folder, "studio": studio_folder})
+
+    def get_folder(self, number):
+        """ 記録済みのフォルダが両方とも存在する場合のみ返す。 """
+        folders = self.folders.get(number)
+        if folders is None or not all(os.path.isdir(folder) for folder in folders):
+            return None
+        return folders
+
+    def record_rating(self, path, size, mtime_ns, rating):
+        self.append({"type": "rating", "path": path, "size": size, "mtime_ns": mtime_ns, "rating": rating})
+
+    def get_rating(self, path, size, mtime_ns):
+        entry = self.ratings.get(self.normalize_path(path))
+        if entry is None or entry[0] != size or entry[1] != mtime_ns:
+            return None
+        return entry[2]
+
+    def record_copied(self, number, source_path, destination_path, size, digest):
+        self.append({"type": "copied", "number": number, "source": source_path, "dest": destination_path,
+                     "size": size, "hash": digest})
+
+    def get_copied_size(self, destination_path):
+        """ コピー済みとして記録され、コピー先に同じサイズのファイルが残っている場合はそのサイズを返す。 """
+        entry = self.copied.get(self.normalize_path(destination_path))
+        if entry is None:
+            return None
+        try:
+            if os.path.getsize(destination_path) == entry[0]:
+                return entry[0]
+        except OSError:
+            pass
+        return None
+
+    def close(self, completed=False):
+        """ completed=True の場合は最後まで処理できたので記録を削除する。 """
+        with self.lock:
+            if self.file is None:
+                return
+            if self.unsynced:
+                self._sync_locked()
+            self.file.close()
+            self.file = None
+        if completed:
+            try:
+                os.unlink(self.journal_path)
+            except OSError:
+                pass
@@ -0,0 +1,54 @@
+"""
+ワーカースレッドからの通知を受け取るチャンネル。
+
+post() はキューに積むだけなので、コピー処理が画面更新を待つことはない。
+Tk のメインループが drain() でまとめて取り出し、同時に全件をログファイルへ書き出す。
+"""
+import os
+import queue
+from datetime import datetime
+
+LOG_FOLDER_NAME = "logs"
+
+
+class NotificationChannel:
+    def __init__(self, log_folder=None):
+        self.queue = queue.Queue()
+        self.log_folder = log_folder
+        self.log_path = None
+        self.log_file = None
+        if log_folder:
+            try:
+                os.makedirs(log_folder, exist_ok=True)
+                self.log_path = os.path.join(log_folder, datetime.now().strftime("notifications_%Y%m%d.log"))
+                self.log_file = open(self.log_path, "a", encoding="utf-8")
+            except OSError as e:
+                print(f"ログファイルを開けません: {e}")
+                self.log_path = None
+                self.log_file = None
+
+    def post(self, message):
+        """ どのスレッドからでも呼び出せる。 """
+        self.queue.put(message)
+
+    def drain(self, max_items=None):
+        """ 溜まっている通知を取り出してログファイルに書き込み、リストで返す。 """
+        messages = []
+        while max_items is None or len(messages) < max_items:
+            try:
+                messages.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        if messages and self.log_file is not None:
+            try:
+                self.log_file.write("".join(message + "\n" for message in messages))
+                self.log_file.flush()
+            except OSError as e:
+                print(f"ログファイル書き込みエラー: {e}")
+        return messages
+
+    def close(self):
+        self.drain()
+        if self.log_file is not None:
+            self.log_file.close()
+            self.log_file = None
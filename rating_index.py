@@ -0,0 +1,126 @@
+"""
+レーティングの永続インデックス。
+
+(パス, サイズ, 更新時刻ns) をキーにレーティングなどのXMPの値（xmp_rating.encode_fields()）を SQLite に保存し、
+変更されていないファイルは再実行時にメタデータを読まずに答える。
+"""
+import os
+import sqlite3
+import threading
+import time
+
+INDEX_FILENAME = "rating_index.sqlite3"
+
+
+class RatingIndex:
+    def __init__(self, db_path, max_age_days=90, max_entries=200000, flush_every=200):
+        self.db_path = db_path
+        self.max_age_days = max_age_days
+        self.max_entries = max_entries
+        self.flush_every = flush_every
+        self.lock = threading.Lock()
+        self.pending_puts = {}
+        self.pending_touches = set()
+
+        folder = os.path.dirname(db_path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        # レーティング抽出はワーカースレッドから呼ばれるため、接続はロックで保護して共有する
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS ratings ("
+            " path TEXT PRIMARY KEY,"
+            " size INTEGER NOT NULL,"
+            " mtime_ns INTEGER NOT NULL,"
+            " rating TEXT NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS ratings_last_used ON ratings (last_used)")
+        self.conn.commit()
+
+    @staticmethod
+    def normalize_path(path):
+        return os.path.normcase(os.path.abspath(path))
+
+    def get(self, path, size, mtime_ns):
+        """ サイズと更新時刻が一致する場合のみレーティングを返す。無ければ None。 """
+        key = self.normalize_path(path)
+        with self.lock:
+            pending = self.pending_puts.get(key)
+            if pending is not None:
+                if pending[0] == size and pending[1] == mtime_ns:
+                    return pending[2]
+                return None
+            row = self.conn.execute(
+                "SELECT rating FROM ratings WHERE path = ? AND size = ? AND mtime_ns = ?",
+                (key, size, mtime_ns),
+            ).fetchone()
+            if row is None:
+                return None
+            self.pending_touches.add(key)
+            return row[0]
+
+    def put(self, path, size, mtime_ns, rating):
+        key = self.normalize_path(path)
+        with self.lock:
+            self.pending_puts[key] = (size, mtime_ns, rating)
+            if len(self.pending_puts) >= self.flush_every:
+                self._flush_locked()
+
+    def flush(self):
+        with self.lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        # 書き込みはまとめて1トランザクションで行う（ファイルごとにコミットしない）
+        if not self.pending_puts and not self.pending_touches:
+            return
+        now = time.time()
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO ratings (path, size, mtime_ns, rating, last_used) VALUES (?, ?, ?, ?, ?)",
+                [(key, size, mtime_ns, rating, now) for key, (size, mtime_ns, rating) in self.pending_puts.items()],
+            )
+            self.conn.executemany(
+                "UPDATE ratings SET last_used = ? WHERE path = ?",
+                [(now, key) for key in self.pending_touches],
+            )
+        self.pending_puts.clear()
+        self.pending_touches.clear()
+
+    def evict(self):
+        """ 古いエントリと上限を超えたエントリを削除し、削除件数を返す。 """
+        with self.lock:
+            self._flush_locked()
+            cutoff = time.time() - self.max_age_days * 24 * 60 * 60
+            with self.conn:
+                removed = self.conn.execute("DELETE FROM ratings WHERE last_used < ?", (cutoff,)).rowcount
+                count = self.conn.execute("SELECT COUNT(*) FROM ratings").fetchone()[0]
+                if count > self.max_entries:
+                    removed += self.conn.execute(
+                        "DELETE FROM ratings WHERE path IN ("
+                        " SELECT path FROM ratings ORDER BY last_used ASC LIMIT ?)",
+                        (count - self.max_entries,),
+                    ).rowcount
+            return removed
+
+    def rebuild(self):
+        """ インデックスを空にする。次回の実行時にレーティングを読み直して再構築される。 """
+        with self.lock:
+            self.pending_puts.clear()
+            self.pending_touches.clear()
+            with self.conn:
+                self.conn.execute("DELETE FROM ratings")
+            self.conn.execute("VACUUM")
+
+    def __len__(self):
+        with self.lock:
+            self._flush_locked()
+            return self.conn.execute("SELECT COUNT(*) FROM ratings").fetchone()[0]
+
+    def close(self):
+        with self.lock:
+            self._flush_locked()
+            self.conn.close()
@@ -0,0 +1,207 @@
+"""
+セレクトPC側フォルダを監視し、レーティングを先に読んでおく。
+
+セレクト作業中に追加・変更されたJPEGのレーティングをレーティングインデックスに保存しておき、
+「写真をコピー」を押した時点ではファイルの照合とコピーだけで済むようにする。
+監視先はネットワーク共有のため、変更通知ではなく一定間隔のフォルダ走査で検出する。
+セレクトPCの作業を妨げないよう、フォルダの一覧とファイルの読み込みを合わせた1秒あたりの件数を制限し、
+更新されていないフォルダ（サブフォルダの無いもの）は一覧も読まない。監視スレッドのI/O・CPUの優先度も下げて実行する。
+"""
+import ctypes
+import os
+import platform
+import sys
+import threading
+import time
+
+import xmp_rating
+from folder_scan import iter_folder_batches, is_image_filename
+
+# Linux の ioprio_set のシステムコール番号
+IOPRIO_SET_SYSCALLS = {"x86_64": 251, "i686": 289, "aarch64": 30, "armv7l": 314}
+IOPRIO_WHO_PROCESS = 1
+IOPRIO_CLASS_IDLE = 3
+IOPRIO_CLASS_SHIFT = 13
+# Windows の SetThreadPriority でI/Oとメモリの優先度も下げる指定
+THREAD_MODE_BACKGROUND_BEGIN = 0x00010000
+
+
+def lower_thread_priority():
+    """ 呼び出したスレッドの優先度を下げる。できなかった場合は False を返す。 """
+    try:
+        if sys.platform == "win32":
+            kernel32 = ctypes.windll.kernel32
+            return bool(kernel32.SetThreadPriority(kernel32.GetCurrentThread(), THREAD_MODE_BACKGROUND_BEGIN))
+        if sys.platform.startswith("linux"):
+            # Linux ではスレッドごとに nice 値とI/Oの優先度を設定できる
+            thread_id = threading.get_native_id()
+            os.setpriority(os.PRIO_PROCESS, thread_id, 19)
+            syscall_number = IOPRIO_SET_SYSCALLS.get(platform.machine())
+            if syscall_number is not None:
+                libc = ctypes.CDLL(None, use_errno=True)
+                libc.syscall(syscall_number, IOPRIO_WHO_PROCESS, thread_id, IOPRIO_CLASS_IDLE << IOPRIO_CLASS_SHIFT)
+            return True
+    except Exception as e:
+        print(f"監視スレッドの優先度を変更できません: {e}")
+    return False
+
+
+class RatingWatcher:
+    """
+    start() で監視スレッドを開始し、stop() で停止する。
+    should_pause() が True を返す間（コピー処理中など）は読み込みを止める。
+    """
+
+    def __init__(self, folder, rating_index, poll_interval=60.0, max_files_per_second=10.0, max_age_days=7,
+                 should_pause=None, on_error=None):
+        self.folder = folder
+        self.rating_index = rating_index
+        # 1回の走査が終わってから次の走査までの秒数
+        self.poll_interval = poll_interval
+        self.read_interval = 1.0 / max_files_per_second if max_files_per_second > 0 else 0.0
+        # 更新が max_age_days 日より前のファイルとフォルダはセレクト済みとみなして読まない（None で全て読む）
+        self.max_age_days = max_age_days
+        self.should_pause = should_pause
+        self.on_error = on_error
+        self.stop_event = threading.Event()
+        self.thread = None
+        # パス → (サイズ, 更新時刻)。前回の走査から変わったファイルだけを読む
+        self.seen = {}
+        # 前回の走査でサブフォルダが無かったフォルダ。更新が max_age_days より前なら一覧を読まない
+        self.leaf_folders = set()
+        self.next_read_at = 0.0
+        self.rated_files = 0
+        self.passes = 0
+
+    def start(self):
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self, timeout=5.0):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+            self.thread = None
+
+    def is_running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def _run(self):
+        lower_thread_priority()
+        while not self.stop_event.is_set():
+            try:
+                self.scan_once()
+                self.passes += 1
+            except Exception as e:
+                self._report_error(e)
+            self.stop_event.wait(self.poll_interval)
+        self._flush()
+
+    def scan_once(self):
+        """ フォルダを1回走査し、新しいファイルと変更されたファイルのレーティングを保存する。 """
+        # 削除されたファイルが残らないよう、走査し終えたら今回見つかったファイルだけに置き換える
+        seen = {}
+        leaf_folders = set()
+        parent_folders = set()
+        oldest_mtime_ns = None
+        if self.max_age_days is not None:
+            oldest_mtime_ns = int((time.time() - self.max_age_days * 86400) * 1e9)
+
+        def enter_folder(folder_entry):
+            parent_folders.add(os.path.dirname(folder_entry.path))
+            # 画像やサイドカーの追加・置き換え（Lightroom は一時ファイル経由で書き換える）でフォルダの更新時刻も変わる。
+            # ただし変わるのは直下に追加されたフォルダだけのため、サブフォルダを持つフォルダ（撮影フォルダ）は常に読み、
+            # 前回サブフォルダが無かったフォルダ（CAM1 など）だけを更新時刻で省く（DirEntry の stat は Windows では一覧の情報で済む）。
+            # ここで取りこぼしたファイルも、コピー時にレーティングを読むため結果は変わらない
+            if oldest_mtime_ns is None or folder_entry.path not in self.leaf_folders:
+                return True
+            try:
+                if folder_entry.stat().st_mtime_ns >= oldest_mtime_ns:
+                    return True
+            except OSError as e:
+                self._report_error(e)
+                return False
+            leaf_folders.add(folder_entry.path)
+            return False
+
+        batches = iter_folder_batches(self.folder, self._report_error, enter_folder, include_empty=True)
+        while True:
+            # フォルダの一覧を1つ読むごとにも間隔を空ける
+            if not self._wait_while_paused() or not self._wait_for_turn():
+                return
+            batch = next(batches, None)
+            if batch is None:
+                break
+            folder, entries = batch
+            # 一覧を読み終えた時点で、サブフォルダがあれば parent_folders に入っている
+            if folder not in parent_folders:
+                leaf_folders.add(folder)
+            for entry in entries:
+                if not self._scan_entry(entry, seen, oldest_mtime_ns):
+                    return
+        self.seen = seen
+        self.leaf_folders = leaf_folders
+        self._flush()
+
+    def _scan_entry(self, entry, seen, oldest_mtime_ns):
+        # 停止された場合は False
+        if not self._wait_while_paused():
+            return False
+        # サイドカーはコピー時と同じくサイドカー自身のパスで記録する
+        is_sidecar = xmp_rating.is_sidecar_filename(entry.name)
+        if not is_sidecar and not is_image_filename(entry.name):
+            return True
+        try:
+            stat = entry.stat()
+        except OSError as e:
+            self._report_error(e)
+            return True
+        signature = (stat.st_size, stat.st_mtime_ns)
+        seen[entry.path] = signature
+        if self.seen.get(entry.path) == signature:
+            return True
+        if oldest_mtime_ns is not None and stat.st_mtime_ns < oldest_mtime_ns:
+            return True
+        if xmp_rating.decode_fields(self.rating_index.get(entry.path, stat.st_size, stat.st_mtime_ns)) is not None:
+            return True
+        if not self._wait_for_turn():
+            return False
+        # 高速経路で判定できないファイルは、コピー時に pyexiv2 で読む
+        if is_sidecar:
+            fields = xmp_rating.read_sidecar_fields(entry.path)
+        else:
+            fields = xmp_rating.read_fields_fast(entry.path)
+        if fields is not None:
+            # 選択ルールはコピー時に決まるため、条件に使える値を全て保存する
+            self.rating_index.put(entry.path, stat.st_size, stat.st_mtime_ns, xmp_rating.encode_fields(fields))
+            self.rated_files += 1
+        return True
+
+    def _wait_while_paused(self):
+        # コピー処理中はフォルダの走査も止める。停止された場合は False
+        while self.should_pause is not None and self.should_pause():
+            if self.stop_event.wait(1.0):
+                return False
+        return not self.stop_event.is_set()
+
+    def _wait_for_turn(self):
+        # 読み込み（フォルダの一覧を含む）の間隔を空ける。停止された場合は False
+        delay = self.next_read_at - time.monotonic()
+        if delay > 0 and self.stop_event.wait(delay):
+            return False
+        self.next_read_at = time.monotonic() + self.read_interval
+        return True
+
+    def _flush(self):
+        try:
+            self.rating_index.flush()
+        except Exception as e:
+            self._report_error(e)
+
+    def _report_error(self, error):
+        if self.on_error is not None:
+            self.on_error(error)
+        else:
+            print(f"監視エラー: {error}")
@@ -0,0 +1,167 @@
+"""
+コピー処理の段階ごとの所要時間を集計し、実行ごとにJSONのレポートとして保存する。
+
+段階の時間は各スレッドで実際に処理していた時間の合計のため、
+並列に処理した段階では実行全体の経過時間より長くなることがある。
+無効にした場合は NullRunReport を使い、計測箇所では何もしない関数を呼ぶだけになる。
+"""
+import bisect
+import contextlib
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+REPORT_FILENAME_FORMAT = "run_report_%Y%m%d_%H%M%S.json"
+# ファイルごとの所要時間のヒストグラムの区切り（ミリ秒、最後の区切りより長いものは "inf" に入る）
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+
+class LatencyHistogram:
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS_MS, seconds * 1000)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def to_dict(self):
+        labels = [f"<={bound}ms" for bound in LATENCY_BUCKETS_MS] + ["inf"]
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count * 1000, 2) if self.count else None,
+            "max_ms": round(self.max * 1000, 2),
+            "buckets": {label: count for label, count in zip(labels, self.counts) if count},
+        }
+
+
+class RunReport:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started_at = datetime.now()
+        self.started = time.perf_counter()
+        self.finished = None
+        self.status = None
+        # 段階名 → 合計秒数（撮影No.ごとの内訳も持つ）
+        self.phases = {}
+        self.number_phases = {}
+        self.histograms = {}
+        self.counters = {}
+        self.numbers = {}
+
+    @contextlib.contextmanager
+    def phase(self, name, number=None):
+        """ with の中の処理時間を段階 name に加算する。 """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_phase(name, time.perf_counter() - started, number)
+
+    @contextlib.contextmanager
+    def latency(self, name, number=None):
+        """ phase() に加えて、1件ごとの時間をヒストグラムに記録する。 """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started
+            self.add_phase(name, seconds, number)
+            self.add_latency(name, seconds)
+
+    def add_phase(self, name, seconds, number=None):
+        with self.lock:
+            self.phases[name] = self.phases.get(name, 0.0) + seconds
+            if number is not None:
+                phases = self.number_phases.setdefault(number, {})
+                phases[name] = phases.get(name, 0.0) + seconds
+
+    def add_latency(self, name, seconds):
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = LatencyHistogram()
+            histogram.add(seconds)
+
+    def count(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def number_done(self, event):
+        """ copy_events.NumberDone を撮影No.ごとの結果として記録する。 """
+        with self.lock:
+            self.numbers[event.number] = event._asdict()
+
+    def finish(self, status):
+        self.finished = time.perf_counter()
+        self.status = status
+
+    def to_dict(self):
+        elapsed = (self.finished or time.perf_counter()) - self.started
+        with self.lock:
+            counters = dict(self.counters)
+            rates = {}
+            if elapsed > 0:
+                for name in ("rated_files", "copied_files", "skipped_files"):
+                    if name in counters:
+                        rates[name.replace("_files", "_files_per_second")] = round(counters[name] / elapsed, 1)
+                if "copied_bytes" in counters:
+                    rates["copied_mb_per_second"] = round(counters["copied_bytes"] / elapsed / 1024 / 1024, 2)
+            return {
+                "started": self.started_at.isoformat(timespec="seconds"),
+                "status": self.status,
+                "elapsed_seconds": round(elapsed, 3),
+                "phase_seconds": {name: round(seconds, 3) for name, seconds in self.phases.items()},
+                "numbers": {
+                    number: dict(self.numbers.get(number, {}),
+                                 phase_seconds={name: round(seconds, 3) for name, seconds in phases.items()})
+                    for number, phases in self.number_phases.items()
+                },
+                "latency": {name: histogram.to_dict() for name, histogram in self.histograms.items()},
+                "counters": counters,
+                "rates": rates,
+            }
+
+    def write(self, folder, extra=None):
+        """ folder にレポートを書き出し、パスを返す。 """
+        report = self.to_dict()
+        if extra:
+            report.update(extra)
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, self.started_at.strftime(REPORT_FILENAME_FORMAT))
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        return path
+
+
+class NullRunReport:
+    """ 計測しない場合に使う。全ての操作は何もしない。 """
+    _null_context = contextlib.nullcontext()
+
+    def phase(self, name, number=None):
+        return self._null_context
+
+    def latency(self, name, number=None):
+        return self._null_context
+
+    def add_phase(self, name, seconds, number=None):
+        pass
+
+    def add_latency(self, name, seconds):
+        pass
+
+    def count(self, name, value=1):
+        pass
+
+    def number_done(self, event):
+        pass
+
+    def finish(self, status):
+        pass
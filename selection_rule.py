@@ -0,0 +1,158 @@
+"""
+コピーする画像を選ぶ条件（選択ルール）。
+
+条件は Python の式と同じ書き方で指定する。使える名前は xmp_rating.XMP_FIELDS の値で、
+    rating >= 4
+    rating == 5 or label == "red"
+    pick == 1 and not tagged
+のように比較・and・or・not・in を組み合わせられる。関数呼び出しや属性の参照は使えない。
+rating・pick は数値、label は文字列、tagged は True / False と比べる（"5" のような型の違う値は書き方の誤りとする）。
+式は実行ごとに1回だけ検証・コンパイルし、画像ごとには値の取り出しと評価だけを行う。
+"""
+import ast
+
+import xmp_rating
+
+DEFAULT_RULE = "rating == 5"
+
+_ALLOWED_NODES = (
+    ast.Expression, ast.BoolOp, ast.And, ast.Or, ast.UnaryOp, ast.Not, ast.USub,
+    ast.Compare, ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE, ast.In, ast.NotIn,
+    ast.Name, ast.Load, ast.Constant, ast.Tuple, ast.List,
+)
+_TRUE_VALUES = {"true", "1", "yes"}
+_NUMBER = "数値"
+_STRING = "文字列"
+_BOOL = "True / False"
+# 比較に使える値の種類
+_FIELD_TYPES = {"rating": _NUMBER, "label": _STRING, "pick": _NUMBER, "tagged": _BOOL}
+
+
+def _to_number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _to_int(value):
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return 0
+
+
+# XMPの文字列を比較に使う値へ変換する（値が無い場合は None が渡される）
+_CONVERTERS = {
+    "rating": _to_number,
+    # 大文字・小文字を区別せずに比較する
+    "label": lambda value: (value or "").lower(),
+    "pick": _to_int,
+    "tagged": lambda value: (value or "").lower() in _TRUE_VALUES,
+}
+
+
+class RuleError(Exception):
+    """ 選択ルールを画像の値で評価できなかった。 """
+
+
+class _LowercaseStrings(ast.NodeTransformer):
+    def visit_Constant(self, node):
+        if isinstance(node.value, str):
+            return ast.copy_location(ast.Constant(node.value.lower()), node)
+        return node
+
+
+class SelectionRule:
+    def __init__(self, text, code, fields):
+        self.text = text
+        self.code = code
+        # 条件に使われている値の名前（XMPから取り出す必要があるもの）
+        self.fields = fields
+
+    def matches(self, fields):
+        """ parse_xmp_fields() の結果が条件に合うかを返す。 """
+        values = {name: _CONVERTERS[name](fields.get(name)) for name in self.fields}
+        try:
+            return bool(eval(self.code, {"__builtins__": {}}, values))
+        except Exception as e:
+            # 1枚の評価の失敗で実行全体を止めないよう、呼び出し側でファイルごとに扱えるようにする
+            raise RuleError(f"選択ルールを評価できません: {self.text} ({e})") from e
+
+    def __repr__(self):
+        return f"SelectionRule({self.text!r})"
+
+
+def _value_type(node):
+    """ 名前・定数が表す値の種類を返す。どちらでもない場合は None。 """
+    if isinstance(node, ast.Name):
+        return _FIELD_TYPES[node.id]
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+        node = node.operand
+    if isinstance(node, ast.Constant):
+        if isinstance(node.value, bool):
+            return _BOOL
+        if isinstance(node.value, (int, float)):
+            return _NUMBER
+        if isinstance(node.value, str):
+            return _STRING
+    return None
+
+
+def _check_comparison(text, left, op, right):
+    if isinstance(op, (ast.In, ast.NotIn)):
+        # in の右側は (4, 5) のような定数の並び、または label（部分一致）
+        if isinstance(right, (ast.Tuple, ast.List)):
+            items = right.elts
+        elif isinstance(right, ast.Name) and _FIELD_TYPES[right.id] == _STRING:
+            items = [right]
+        else:
+            raise ValueError(f"選択ルールの in の右側には (4, 5) のような値の並びを書いてください: {text}")
+    elif isinstance(right, (ast.Tuple, ast.List)) or isinstance(left, (ast.Tuple, ast.List)):
+        raise ValueError(f"選択ルールの値の並びは in と組み合わせてください: {text}")
+    else:
+        items = [right]
+    left_type = _value_type(left)
+    for item in items:
+        item_type = _value_type(item)
+        if left_type is None or item_type is None:
+            raise ValueError(f"選択ルールで比べられるのは名前と値だけです: {text}")
+        if left_type != item_type:
+            raise ValueError(f"選択ルールで{left_type}と{item_type}を比べています: {text}")
+
+
+def compile_rule(text):
+    """ 条件の文字列を検証して SelectionRule を返す。書き方が正しくない場合は ValueError を送出する。 """
+    text = (text or "").strip() or DEFAULT_RULE
+    try:
+        tree = ast.parse(text, mode="eval")
+    except SyntaxError as e:
+        raise ValueError(f"選択ルールの書き方が正しくありません: {text} ({e.msg})") from None
+    fields = []
+    for node in ast.walk(tree):
+        if not isinstance(node, _ALLOWED_NODES):
+            raise ValueError(f"選択ルールに使えない書き方が含まれています: {text}")
+        if isinstance(node, ast.Name):
+            if node.id not in xmp_rating.XMP_FIELDS:
+                names = ", ".join(xmp_rating.XMP_FIELDS)
+                raise ValueError(f"選択ルールの {node.id} は使えません（使える名前: {names}）")
+            if node.id not in fields:
+                fields.append(node.id)
+        if isinstance(node, ast.Constant) and not isinstance(node.value, (str, int, float, bool)):
+            raise ValueError(f"選択ルールに使えない値が含まれています: {text}")
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub) and _value_type(node) != _NUMBER:
+            raise ValueError(f"選択ルールの - は数値にだけ付けられます: {text}")
+    # 型の違う値との比較は常に一致しないため、実行前に誤りとして知らせる
+    in_sequences = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Compare):
+            operands = [node.left] + node.comparators
+            for left, op, right in zip(operands, node.ops, operands[1:]):
+                _check_comparison(text, left, op, right)
+                if isinstance(op, (ast.In, ast.NotIn)):
+                    in_sequences.add(id(right))
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Tuple, ast.List)) and id(node) not in in_sequences:
+            raise ValueError(f"選択ルールの値の並びは in と組み合わせてください: {text}")
+    tree = ast.fix_missing_locations(_LowercaseStrings().visit(tree))
+    return SelectionRule(text, compile(tree, "<selection rule>", "eval"), tuple(fields))
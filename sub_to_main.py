@@ -1,17 +1,31 @@
 import tkinter as tk
 import tkinter.ttk as ttk
 from tkinter import filedialog
-import shutil
 from datetime import datetime
-import threading
 import os
 import sys
 import json
-import pyexiv2
+from copy_engine import CopyEngine, CopyConfig, get_data_folder, open_rating_index
+from copy_events import (
+    RunStarted, FolderCheckStarted, FolderSearchStarted, FolderResolved, FolderNotFound, FilesMatched,
+    DuplicateFilesFound, FileRated, FileCopied, FileSkipped, NumberDone, ErrorOccurred, RunFinished,
+    JournalResumed, ReportWritten, RUN_DONE, RUN_CANCELLED,
+)
+from notification_log import NotificationChannel, LOG_FOLDER_NAME
+from rating_watcher import RatingWatcher
+from selection_rule import DEFAULT_RULE
+from fast_copy import SKIP_SIZE_MTIME, SKIP_HASH, VERIFY_SYNC, VERIFY_READBACK
 from PIL import Image
 from ttkthemes import ThemedStyle
 import winreg
 
+FOLDER_ROLE_LABELS = {"select": "セレクトPC側", "studio": "記念スタジオ側", "main": "メインPC"}
+# コピー内容の確認方法の表示名（レジストリには値の方を保存する）
+VERIFY_LABELS = {"": "しない", VERIFY_SYNC: "書き込みを確定する", VERIFY_READBACK: "読み直して照合する"}
+# メインPCに同じファイルがある場合の判定方法の表示名（"off" は常にコピーする。レジストリに無い場合は既定のサイズと更新日時）
+SKIP_OFF = "off"
+SKIP_LABELS = {SKIP_SIZE_MTIME: "サイズと更新日時が同じなら省く", SKIP_HASH: "内容が同じなら省く", SKIP_OFF: "省かずにコピーする"}
+
 class CopyImagesApp:
     def __init__(self, app):
         self.app = app
@@ -39,11 +53,20 @@ class CopyImagesApp:
         except:
             pass
 
-        self.copy_in_progress = False
+        # 通知はキュー経由でまとめて表示し、一覧は直近の件数だけ残す
+        self.notification_channel = NotificationChannel(os.path.join(get_data_folder(), LOG_FOLDER_NAME))
+        self.max_notification_lines = 1000
+        self.notification_poll_ms = 100
+        # コピー処理本体（GUIに依存しない）。実行ごとに作成する
+        self.rating_index = open_rating_index()
+        self.engine = None
+        # セレクトPC側のレーティングを先読みする監視（設定で有効にした場合のみ）
+        self.rating_watcher = None
         self.source_folder1_path = ""
         self.source_folder2_path = ""
         self.destination_folder_path = ""
         self.setup_gui()
+        self.poll_notifications()
 
         # ThemedStyleを使用してテーマを適用
         self.style = ThemedStyle(self.app)
@@ -54,7 +77,12 @@ class CopyImagesApp:
             self.source_folder1_path = saved_settings.get("source_folder1_path", "")
             self.source_folder2_path = saved_settings.get("source_folder2_path", "")
             self.destination_folder_path = saved_settings.get("destination_folder_path", "")
+            self.watch_select_folder.set(saved_settings.get("watch_select_folder", False))
+            self.selection_rule.set(saved_settings.get("selection_rule", DEFAULT_RULE))
+            self.verify_label.set(VERIFY_LABELS.get(saved_settings.get("verify", ""), VERIFY_LABELS[""]))
+            self.skip_label.set(SKIP_LABELS.get(saved_settings.get("skip_identical", ""), SKIP_LABELS[SKIP_SIZE_MTIME]))
             self.update_folder_labels()
+            self.update_rating_watcher()
 
 
     def setup_gui(self):
@@ -131,18 +159,66 @@ class CopyImagesApp:
         self.destination_label = ttk.Label(folder_frame, text="メインPC: 未選択", font=("Meiryo", 9))
         self.destination_label.grid(row=2, column=1, padx=5, pady=5, sticky="w")
 
+        index_button = ttk.Button(folder_frame, text="索引を再構築", command=self.rebuild_rating_index, width=12)
+        index_button.grid(row=3, column=0, padx=5, pady=5, sticky="ew")
+        index_label = ttk.Label(folder_frame, text="レーティングの保存情報を削除します", font=("Meiryo", 9))
+        index_label.grid(row=3, column=1, padx=5, pady=5, sticky="w")
+
+        self.watch_select_folder = tk.BooleanVar(value=False)
+        watch_check = ttk.Checkbutton(folder_frame, text="セレクトPC側のレーティングを先読みする",
+                                      variable=self.watch_select_folder, command=self.on_watch_setting_changed)
+        watch_check.grid(row=4, column=0, columnspan=2, padx=5, pady=5, sticky="w")
+
+        # コピーする画像の条件（例: rating >= 4、rating == 5 or label == "red"）
+        rule_label = ttk.Label(folder_frame, text="選択ルール", font=("Meiryo", 9))
+        rule_label.grid(row=5, column=0, padx=5, pady=5, sticky="w")
+        self.selection_rule = tk.StringVar(value=DEFAULT_RULE)
+        rule_entry = ttk.Entry(folder_frame, textvariable=self.selection_rule, font=("Meiryo", 9))
+        rule_entry.grid(row=5, column=1, padx=5, pady=5, sticky="ew")
+
+        # コピー先の内容の確認（読み直しはメインPCへの読み込みが1回増える）
+        verify_label = ttk.Label(folder_frame, text="コピーの確認", font=("Meiryo", 9))
+        verify_label.grid(row=6, column=0, padx=5, pady=5, sticky="w")
+        self.verify_label = tk.StringVar(value=VERIFY_LABELS[""])
+        verify_combo = ttk.Combobox(folder_frame, textvariable=self.verify_label, values=list(VERIFY_LABELS.values()),
+                                    state="readonly", font=("Meiryo", 9))
+        verify_combo.grid(row=6, column=1, padx=5, pady=5, sticky="ew")
+        verify_combo.bind("<<ComboboxSelected>>", lambda event: self.save_settings_to_registry())
+
+        # メインPCに同じファイルがある場合にコピーを省くか（撮り直し・差し替え時は「省かずにコピーする」）
+        skip_label = ttk.Label(folder_frame, text="コピー済みの判定", font=("Meiryo", 9))
+        skip_label.grid(row=7, column=0, padx=5, pady=5, sticky="w")
+        self.skip_label = tk.StringVar(value=SKIP_LABELS[SKIP_SIZE_MTIME])
+        skip_combo = ttk.Combobox(folder_frame, textvariable=self.skip_label, values=list(SKIP_LABELS.values()),
+                                  state="readonly", font=("Meiryo", 9))
+        skip_combo.grid(row=7, column=1, padx=5, pady=5, sticky="ew")
+        skip_combo.bind("<<ComboboxSelected>>", lambda event: self.save_settings_to_registry())
+
         folder_frame.grid_columnconfigure(1, weight=1)
 
         info_frame = tk.Frame(self.app, bg="yellow")
         info_frame.grid(row=10, column=0, columnspan=2, sticky="ew", pady=5, padx=10)
-        info_label = tk.Label(info_frame, text="セレクトで星５のみを抽出してコピーしています。\nコピー完了後は必ず伝票と目視で\n記念メインを確認してください。", font=("Meiryo", 10), justify="center", foreground="black", background="yellow")
+        info_label = tk.Label(info_frame, text="セレクトで選択ルールに合う写真（既定は星５）のみを抽出してコピーしています。\nコピー完了後は必ず伝票と目視で\n記念メインを確認してください。", font=("Meiryo", 10), justify="center", foreground="black", background="yellow")
         info_label.pack(expand=True)
 
     def add_notification(self, message):
+        # ワーカースレッドからも呼ばれるため、ここでは Tk に触れずキューに積むだけにする
         timestamp = datetime.now().strftime("[%H:%M:%S] ")
         message = timestamp + message
-        self.notification_listbox.insert(tk.END, message)
-        self.notification_listbox.see(tk.END)
+        self.notification_channel.post(message)
+
+    def poll_notifications(self):
+        # メインループ上で溜まった通知をまとめて表示する（全件はログファイルに残る）
+        messages = self.notification_channel.drain()
+        if messages:
+            # 表示件数の上限を超える分は古いものから捨てる
+            messages = messages[-self.max_notification_lines:]
+            self.notification_listbox.insert(tk.END, *messages)
+            overflow = self.notification_listbox.size() - self.max_notification_lines
+            if overflow > 0:
+                self.notification_listbox.delete(0, overflow - 1)
+            self.notification_listbox.see(tk.END)
+        self.app.after(self.notification_poll_ms, self.poll_notifications)
 
     # コピー処理の中に進捗情報を表示するための関数を追加
     def update_copy_progress(self, folder_number, image_filename):
@@ -150,187 +226,16 @@ class CopyImagesApp:
         self.add_notification(message)
 
     def cancel_copy(self):
-        if self.copy_in_progress:
+        if self.engine is not None and self.engine.cancel():
             self.add_notification("コピー処理を中止します.")
-            self.copy_in_progress = False
         else:
             self.add_notification("コピー処理は実行されていません.")
 
-    def find_files_recursively(self, base_folder):
-        all_files = []
-
-        try:
-            for root, dirs, files in os.walk(base_folder):
-                  # .DS_Store ファイルを除外
-                dirs[:] = [d for d in dirs if not d.startswith('.')]
-                files = [f for f in files if not f.startswith('.DS_Store')]
-
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    all_files.append(file_path)
-        except OSError as e:
-            error_msg = f"フォルダアクセスエラー {base_folder}: {str(e)} (errno: {getattr(e, 'errno', 'unknown')})"
-            self.add_notification(error_msg)
-            print(f"os.walk error: {e}")
-
-        return all_files
-    
-
-    def find_folder_with_number_recursive_common(self,base_folder, target_number):
-        for root, dirs, files in os.walk(base_folder):
-            # .DS_Store ファイルを除外
-            dirs[:] = [d for d in dirs if not d.startswith('.')]
-            files = [f for f in files if not f.startswith('.DS_Store')]
-
-            for dir_name in dirs:
-                full_dir_path = os.path.join(root, dir_name)
-                # 4桁の数字で始まり、その後にハイフンが含まれていない条件
-                if dir_name.startswith(target_number) and '-' not in dir_name:
-                    image_files = self.find_image_files_in_folder(full_dir_path)
-                    if image_files:
-                        # 画像ファイルが存在する場合はそのまま返す
-                        return full_dir_path
-                # 入れ子のフォルダがある場合、再帰的に探索を行う
-                found_path = self.find_folder_with_number_recursive_common(full_dir_path, target_number)
-                if found_path:
-                    return found_path
-        return None
-
-
-    def find_image_files_in_folder(self, folder):
-        image_files = []
-        for root, dirs, files in os.walk(folder):
-            # .DS_Store ファイルを除外
-            dirs[:] = [d for d in dirs if not d.startswith('.')]
-            files = [f for f in files if not f.startswith('.DS_Store')]
-
-            for file in files:
-                if file.lower().endswith(('.jpg', '.jpeg')):
-                    image_files.append(os.path.join(root, file))
-        return image_files
-
-    def get_xmp_rating(self, image_path):
-        import tempfile
-        import shutil
-        
-        try:
-            # pyexiv2のログレベルを設定してSony1警告を抑制
-            pyexiv2.set_log_level(4)  # エラーレベルのみ
-            
-            # 日本語パスの問題を解決するため一時ファイルにコピー
-            with tempfile.NamedTemporaryFile(suffix='.jpg', delete=False) as temp_file:
-                temp_path = temp_file.name
-            
-            # 元ファイルを一時ファイルにコピー
-            shutil.copy2(image_path, temp_path)
-            
-            try:
-                with pyexiv2.Image(temp_path) as set_image:
-                    xmp = set_image.read_xmp()
-                    if 'Xmp.xmp.Rating' in xmp:
-                        rating = xmp['Xmp.xmp.Rating']
-                        return rating
-                    else:
-                        # レーティングが見つからない場合は0を返す
-                        return "0"
-            finally:
-                # 一時ファイルを削除
-                try:
-                    os.unlink(temp_path)
-                except:
-                    pass
-                    
-        except Exception as e:
-            error_message = str(e)
-            self.add_notification(f"Error while extracting XMP Rating from {image_path}: {error_message}")
-        return "0"
-
-
-
-
-     # コピー処理の中で進捗情報を表示するたびに呼び出す
-    def copy_images(self, folder_numbers, source_folder1_path, source_folder2_path, destination_folder_path):
-        for folder_number in folder_numbers:
-            source_folder1 = self.find_folder_with_number_recursive_common(source_folder1_path, folder_number)
-            source_folder2 = self.find_folder_with_number_recursive_common(source_folder2_path, folder_number)
-            
-            if source_folder1 is None or source_folder2 is None:
-                self.add_notification(f"警告: 撮影No.{folder_number}のフォルダが見つかりませんでした.")
-                continue
-
-            self.add_notification(f"撮影No.{folder_number}の処理を開始します...")
-            
-            # 全ファイルを取得して進捗計算用にカウント
-            all_select_files = self.find_files_recursively(source_folder1)
-            total_files = len(all_select_files)
-            processed_files = 0
-            rating5_found = 0
-            copied_images = 0
-
-            self.add_notification(f"セレクト側ファイル数: {total_files}枚")
-
-            for image_path in all_select_files:
-                if not self.copy_in_progress:
-                    self.add_notification("コピー処理が中止されました.")
-                    return
-                
-                processed_files += 1
-                self.add_notification(f"進捗: {processed_files}/{total_files} - {os.path.basename(image_path)}")
-                
-                rating1 = self.get_xmp_rating(image_path)
-                if rating1 == "5":
-                    rating5_found += 1
-                    image_filename1 = os.path.basename(image_path)
-                    corresponding_image = os.path.join(source_folder2, image_filename1)
-                    corresponding_image = os.path.normpath(corresponding_image)
-                    
-                    if os.path.exists(corresponding_image):
-                        # 一時フォルダ内にコピー先フォルダを作成（Studio側のフォルダ名を使用）
-                        temp_folder = os.path.join(self.get_temp_folder(), os.path.basename(source_folder2))
-                        if not os.path.exists(temp_folder):
-                            os.makedirs(temp_folder, exist_ok=True)
-
-                        destination_path = os.path.join(temp_folder, image_filename1)
-                        shutil.copyfile(corresponding_image, destination_path)
-                        copied_images += 1
-                        self.add_notification(f"★コピー完了: {image_filename1}")
-                    else:
-                        self.add_notification(f"対応する画像が存在しません: {image_filename1}")
-
-            self.move_temp_folders(destination_folder_path)
-            self.add_notification(f"撮影No.{folder_number}完了 - レーティング5: {rating5_found}枚, コピー: {copied_images}枚")
-
-    def get_temp_folder(self):
-        # アプリケーションの実行ディレクトリを取得
-        app_directory = os.path.dirname(__file__)
-
-        # 一時フォルダを返す
-        return os.path.join(app_directory, "temp_copy_folder")
-
-    def move_temp_folders(self, destination_folder_path):
-        # 一時フォルダからコピー先フォルダへ移動
-        temp_folder = self.get_temp_folder()
-        
-        # 一時フォルダが存在しない場合は何もしない
-        if not os.path.exists(temp_folder):
-            return
-            
-        for temp_subfolder in os.listdir(temp_folder):
-            temp_subfolder_path = os.path.join(temp_folder, temp_subfolder)
-            if os.path.exists(temp_subfolder_path) and os.path.isdir(temp_subfolder_path):
-                destination_subfolder = os.path.join(destination_folder_path, temp_subfolder)
-                os.makedirs(destination_subfolder, exist_ok=True)
-                for file in os.listdir(temp_subfolder_path):
-                    file_path = os.path.join(temp_subfolder_path, file)
-                    if os.path.isfile(file_path):
-                        destination_path = os.path.join(destination_subfolder, file)
-                        shutil.move(file_path, destination_path)
-                os.rmdir(temp_subfolder_path)  # 一時フォルダを削除
-
-
+    def is_copy_in_progress(self):
+        return self.engine is not None and self.engine.copy_in_progress
 
     def copy_images_parallel(self):
-        if self.copy_in_progress:
+        if self.is_copy_in_progress():
             self.add_notification("エラー: 既にコピー処理が進行中です。")
             return
 
@@ -341,43 +246,173 @@ class CopyImagesApp:
         folder_numbers_input = self.folder_number_entry.get()
         folder_numbers = [number.strip() for number in folder_numbers_input.split(",")]
 
-        self.copy_in_progress = True
+        config = CopyConfig(folder_numbers, self.source_folder1_path, self.source_folder2_path, self.destination_folder_path,
+                            selection_rule=self.selection_rule.get(), verify=self.get_verify_setting(),
+                            skip_identical=self.get_skip_setting())
+        try:
+            engine = CopyEngine(config, listeners=[self.on_copy_event], rating_index=self.rating_index)
+        except ValueError as e:
+            self.add_notification(f"エラー: {e}")
+            return
+        self.engine = engine
+        self.save_settings_to_registry()
         self.add_notification("コピー処理を開始します...")
-
-        def copy_images_thread():
-            try:
-                print(f"destination_folder_path: {self.destination_folder_path}")
-                print(f"Source folder 1 path: {self.source_folder1_path}")
-                print(f"Source folder 2 path: {self.source_folder2_path}")
-                
-                # フォルダアクセス可能性をチェック
-                self.add_notification("フォルダへのアクセスを確認中...")
-                if not os.path.exists(self.source_folder1_path):
-                    self.add_notification(f"エラー: セレクトPC側フォルダにアクセスできません: {self.source_folder1_path}")
-                    return
-                if not os.path.exists(self.source_folder2_path):
-                    self.add_notification(f"エラー: 記念スタジオ側フォルダにアクセスできません: {self.source_folder2_path}")
-                    return
-                if not os.path.exists(self.destination_folder_path):
-                    self.add_notification(f"エラー: メインPCフォルダにアクセスできません: {self.destination_folder_path}")
-                    return
-                
-                self.copy_images(folder_numbers, self.source_folder1_path, self.source_folder2_path, self.destination_folder_path)
-                self.add_notification("コピー処理が完了しました.")
-            except Exception as e:
-                error_msg = f"コピー処理中にエラーが発生しました: {str(e)} (errno: {getattr(e, 'errno', 'unknown')})"
-                self.add_notification(error_msg)
-                print(f"Error details: {e}")
-            finally:
-                self.copy_in_progress = False
-
-        copy_thread = threading.Thread(target=copy_images_thread)
-        copy_thread.start()
+        self.engine.start()
+
+    def on_copy_event(self, event):
+        # コピー処理のイベントを通知用の文章に変換する（コピー用のスレッドから呼ばれる）
+        for message in self.describe_copy_event(event):
+            self.add_notification(message)
+
+    def describe_copy_event(self, event, max_listed=20):
+        if isinstance(event, RunStarted):
+            return [f"選択ルール: {event.selection_rule}"]
+        if isinstance(event, FolderCheckStarted):
+            return ["フォルダへのアクセスを確認中..."]
+        if isinstance(event, FolderSearchStarted):
+            return ["撮影No.のフォルダを検索中..."]
+        if isinstance(event, FolderNotFound):
+            return [f"警告: 撮影No.{event.number}のフォルダが見つかりませんでした."]
+        if isinstance(event, FolderResolved):
+            return [f"撮影No.{event.number}の処理を開始します..."]
+        if isinstance(event, FilesMatched):
+            # 複数の撮影No.を同時に処理するため、撮影No.ごとの行には番号を付ける
+            messages = [f"[{event.number}] セレクト側ファイル数: {event.select_files}枚 (記念スタジオ側と一致: {event.matched}枚)"]
+            if event.unsupported:
+                messages.append(f"[{event.number}] レーティングを読めない形式のファイルを除外しました: {event.unsupported}枚")
+            # 記念スタジオ側に存在しないファイルはまとめて通知する（レーティングは読まない）
+            if event.unmatched:
+                messages.append(f"[{event.number}] 対応する画像が記念スタジオ側に存在しません: {event.unmatched}枚")
+                listed = ", ".join(event.unmatched_filenames[:max_listed])
+                if event.unmatched > max_listed:
+                    listed += f" ...他{event.unmatched - max_listed}枚"
+                messages.append(listed)
+            return messages
+        if isinstance(event, DuplicateFilesFound):
+            messages = [f"警告: 記念スタジオ側に同名のファイルが複数あります: {len(event.duplicates)}件 (最初に見つかったファイルを使用します)"]
+            for filename in list(event.duplicates)[:max_listed]:
+                paths = [os.path.relpath(path, event.studio_folder) for path in event.duplicates[filename]]
+                messages.append(f"  {filename}: {', '.join(paths)}")
+            if len(event.duplicates) > max_listed:
+                messages.append(f"  ...他{len(event.duplicates) - max_listed}件")
+            return messages
+        if isinstance(event, FileRated):
+            # 全体の件数はセレクト側の一覧を読み終えるまで分からない
+            total = event.total if event.total is not None else "?"
+            return [f"[{event.number}] 進捗: {event.processed}/{total} - {os.path.basename(event.path)}"]
+        if isinstance(event, FileCopied):
+            rate = event.bytes / event.seconds if event.seconds > 0 else 0.0
+            return [f"[{event.number}] ★コピー完了: {event.filename} ({self.format_size(event.bytes)}, {self.format_size(rate)}/s)"]
+        if isinstance(event, FileSkipped):
+            reason = "前回の実行でコピー済み" if event.reason == "journal" else "メインPCに同じファイルあり"
+            return [f"[{event.number}] コピー済み: {event.filename} ({reason})"]
+        if isinstance(event, JournalResumed):
+            return [f"前回中断した処理の記録があります。続きから再開します (コピー済み: {event.copied}枚)"]
+        if isinstance(event, NumberDone):
+            rate = event.bytes / event.seconds if event.seconds > 0 else 0.0
+            message = (f"撮影No.{event.number}完了 - 選択: {event.selected}枚, コピー: {event.copied}枚 "
+                       f"({self.format_size(event.bytes)}, {self.format_size(rate)}/s)")
+            if event.skipped:
+                message += f", コピー済みのため省略: {event.skipped}枚 ({self.format_size(event.skipped_bytes)})"
+            return [message]
+        if isinstance(event, ErrorOccurred):
+            errno = event.errno if event.errno is not None else 'unknown'
+            if event.kind == "folder_access":
+                return [f"エラー: {FOLDER_ROLE_LABELS[event.role]}フォルダにアクセスできません: {event.path}"]
+            if event.kind == "walk":
+                return [f"フォルダアクセスエラー {event.path}: {event.message} (errno: {errno})"]
+            if event.kind == "verify":
+                return [f"検証エラー: コピー元とコピー先の内容が一致しません: {event.path}"]
+            if event.kind == "rating":
+                return [f"Error while extracting XMP Rating from {event.path}: {event.message}"]
+            if event.kind == "rule":
+                return [f"{event.message}: {event.path}"]
+            return [f"コピー処理中にエラーが発生しました: {event.message} (errno: {errno})"]
+        if isinstance(event, ReportWritten):
+            return [f"実行レポートを保存しました: {event.path}"]
+        if isinstance(event, RunFinished):
+            if event.status == RUN_DONE:
+                return ["コピー処理が完了しました."]
+            if event.status == RUN_CANCELLED:
+                return ["コピー処理が中止されました."]
+        return []
+
+    def format_size(self, size):
+        for unit in ("B", "KB", "MB"):
+            if size < 1024:
+                return f"{size:.1f}{unit}" if unit != "B" else f"{int(size)}{unit}"
+            size /= 1024
+        return f"{size:.1f}GB"
 
     def on_closing(self):
         self.save_settings_to_registry()
+        # 監視スレッドがインデックスに書き込まないよう、先に停止する
+        self.stop_rating_watcher()
+        self.close_rating_index()
+        self.notification_channel.close()
         self.app.destroy()
 
+    def close_rating_index(self):
+        if self.rating_index is None:
+            return
+        try:
+            self.rating_index.close()
+        except Exception as e:
+            print(f"レーティングインデックス保存エラー: {e}")
+        self.rating_index = None
+
+    def rebuild_rating_index(self):
+        if self.is_copy_in_progress():
+            self.add_notification("エラー: コピー処理中はインデックスを再構築できません。")
+            return
+        if self.rating_index is None:
+            self.add_notification("レーティングインデックスは使用できません。")
+            return
+        try:
+            self.rating_index.rebuild()
+            self.add_notification("レーティングインデックスを削除しました。次回のコピー時に再作成されます。")
+        except Exception as e:
+            self.add_notification(f"レーティングインデックスの再構築に失敗しました: {str(e)}")
+        # 監視中の場合は読み込み済みの記録を捨てて最初から読み直す
+        self.update_rating_watcher()
+
+    def on_watch_setting_changed(self):
+        self.save_settings_to_registry()
+        self.update_rating_watcher()
+        if self.watch_select_folder.get():
+            self.add_notification("セレクトPC側のレーティングの先読みを開始しました。")
+        else:
+            self.add_notification("セレクトPC側のレーティングの先読みを停止しました。")
+
+    def update_rating_watcher(self):
+        # 設定やフォルダが変わるたびに作り直す
+        self.stop_rating_watcher()
+        if not self.watch_select_folder.get() or not self.source_folder1_path or self.rating_index is None:
+            return
+        # コピー処理中はセレクトPCへの読み込みを止める
+        self.rating_watcher = RatingWatcher(self.source_folder1_path, self.rating_index,
+                                            should_pause=self.is_copy_in_progress).start()
+
+    def stop_rating_watcher(self):
+        if self.rating_watcher is None:
+            return
+        self.rating_watcher.stop()
+        self.rating_watcher = None
+
+    def get_verify_setting(self):
+        # 表示名から CopyConfig.verify の値に戻す（しない場合は None）
+        for value, label in VERIFY_LABELS.items():
+            if label == self.verify_label.get():
+                return value or None
+        return None
+
+    def get_skip_setting(self):
+        # 表示名から CopyConfig.skip_identical の値に戻す（常にコピーする場合は None）
+        for value, label in SKIP_LABELS.items():
+            if label == self.skip_label.get():
+                return None if value == SKIP_OFF else value
+        return SKIP_SIZE_MTIME
+
     def save_settings_to_registry(self):
         try:
             # HKEY_CURRENT_USERに設定を保存
@@ -385,6 +420,10 @@ class CopyImagesApp:
             winreg.SetValueEx(key, "source_folder1_path", 0, winreg.REG_SZ, self.source_folder1_path)
             winreg.SetValueEx(key, "source_folder2_path", 0, winreg.REG_SZ, self.source_folder2_path)
             winreg.SetValueEx(key, "destination_folder_path", 0, winreg.REG_SZ, self.destination_folder_path)
+            winreg.SetValueEx(key, "watch_select_folder", 0, winreg.REG_DWORD, int(self.watch_select_folder.get()))
+            winreg.SetValueEx(key, "selection_rule", 0, winreg.REG_SZ, self.selection_rule.get())
+            winreg.SetValueEx(key, "verify", 0, winreg.REG_SZ, self.get_verify_setting() or "")
+            winreg.SetValueEx(key, "skip_identical", 0, winreg.REG_SZ, self.get_skip_setting() or SKIP_OFF)
             winreg.CloseKey(key)
         except Exception as e:
             print(f"レジストリ保存エラー: {e}")
@@ -396,6 +435,23 @@ class CopyImagesApp:
             settings["source_folder1_path"] = winreg.QueryValueEx(key, "source_folder1_path")[0]
             settings["source_folder2_path"] = winreg.QueryValueEx(key, "source_folder2_path")[0]
             settings["destination_folder_path"] = winreg.QueryValueEx(key, "destination_folder_path")[0]
+            try:
+                # 先読みの設定は後から追加したため、無い場合は無効とする
+                settings["watch_select_folder"] = bool(winreg.QueryValueEx(key, "watch_select_folder")[0])
+            except OSError:
+                pass
+            try:
+                settings["selection_rule"] = winreg.QueryValueEx(key, "selection_rule")[0]
+            except OSError:
+                pass
+            try:
+                settings["verify"] = winreg.QueryValueEx(key, "verify")[0]
+            except OSError:
+                pass
+            try:
+                settings["skip_identical"] = winreg.QueryValueEx(key, "skip_identical")[0]
+            except OSError:
+                pass
             winreg.CloseKey(key)
             return settings
         except (FileNotFoundError, OSError, Exception):
@@ -407,6 +463,7 @@ class CopyImagesApp:
             self.source_folder1_path = folder_path
             self.source1_label.config(text=f"セレクトPC側: {os.path.basename(folder_path)}")
             self.save_settings_to_registry()
+            self.update_rating_watcher()
 
     def select_source_folder2(self):
         folder_path = filedialog.askdirectory(title="記念スタジオ側フォルダを選択してください")
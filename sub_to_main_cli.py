@@ -0,0 +1,141 @@
+"""
+記念サブ＝＞メイン のコマンドライン版。
+
+GUIと同じ 検索→レーティング→照合→コピー の処理を画面なしで実行し、
+進捗を1行1件のJSON（JSON Lines）で標準出力に書き出す。
+
+例:
+    python sub_to_main_cli.py --select /mnt/select/2024 --studio /mnt/studio/2024 \\
+        --main /mnt/main/2024 --rating-workers 8 --copy-workers 4 1234 1235
+"""
+import argparse
+import contextlib
+import json
+import signal
+import sys
+import threading
+import time
+from datetime import datetime
+
+from copy_engine import CopyEngine, CopyConfig, open_rating_index
+from copy_events import BytesCopied, RUN_DONE, event_to_dict
+from fast_copy import DEFAULT_BUFFER_SIZE, SKIP_SIZE_MTIME, SKIP_HASH, VERIFY_SYNC, VERIFY_READBACK
+from selection_rule import compile_rule, DEFAULT_RULE
+
+
+def parse_folder_numbers(values):
+    # GUIと同じくカンマ区切りも受け付ける
+    folder_numbers = []
+    for value in values:
+        folder_numbers.extend(number.strip() for number in value.split(","))
+    return folder_numbers
+
+
+def parse_selection_rule(value):
+    # 書き方の誤りは処理を始める前に知らせる
+    try:
+        return compile_rule(value).text
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="セレクトPCで選択ルールに合う写真（既定は星5）を記念スタジオPCからメインPCへコピーします。")
+    parser.add_argument("folder_numbers", nargs="+", help="撮影No.（4桁）。複数指定またはカンマ区切り")
+    parser.add_argument("--select", required=True, help="セレクトPC側の年度フォルダ")
+    parser.add_argument("--studio", required=True, help="記念スタジオ側の年度フォルダ")
+    parser.add_argument("--main", required=True, help="メインPCの年度フォルダ")
+    parser.add_argument("--rating-workers", type=int, default=8, help="レーティング抽出の並列数")
+    parser.add_argument("--copy-workers", type=int, default=4, help="同時コピー数")
+    parser.add_argument("--number-workers", type=int, default=2, help="同時に処理する撮影No.の数")
+    parser.add_argument("--io-limit", type=int, default=12, help="全撮影No.で共有する同時I/O数の上限")
+    parser.add_argument("--host-io-limit", type=int, default=6,
+                        help="ファイルサーバー（セレクトPC・記念スタジオPC・メインPC）ごとの同時I/O数の上限（0 で制限しない）")
+    parser.add_argument("--buffer-size", type=int, default=DEFAULT_BUFFER_SIZE // 1024, help="コピーのバッファサイズ(KB)")
+    parser.add_argument("--temp-copy-folder", action="store_true", help="temp_copy_folder を経由してコピーする")
+    parser.add_argument("--index-path", help="レーティングインデックスのパス")
+    parser.add_argument("--no-index", action="store_true", help="レーティングインデックスを使わない")
+    parser.add_argument("--skip-identical", choices=("size-mtime", "hash", "off"), default="size-mtime",
+                        help="メインPCに同じファイルがある場合の判定方法（off は常に上書き）")
+    parser.add_argument("--verify", choices=("off", "sync", "readback"), default="off",
+                        help="コピー内容の確認（sync: 書き込みをfsyncで確定するのみ, readback: さらにコピー先を1回読み直してハッシュを比較）")
+    parser.add_argument("--manifest-folder", help="検証で一致しなかったファイルの一覧の保存先")
+    parser.add_argument("--report-folder", help="実行レポート（段階ごとの所要時間）の保存先")
+    parser.add_argument("--no-report", action="store_true", help="実行レポートを作成しない")
+    parser.add_argument("--journal-folder", help="作業記録（中断時の再開用）の保存先フォルダ")
+    parser.add_argument("--no-journal", action="store_true", help="作業記録を使わない")
+    parser.add_argument("--rule", type=parse_selection_rule, default=DEFAULT_RULE,
+                        help='コピーする画像の条件（例: "rating >= 4", \'rating == 5 or label == "red"\'）')
+    parser.add_argument("--byte-progress", action="store_true", help="コピー中のバッファごとの転送量も出力する")
+    return parser
+
+
+class JsonLinesReporter:
+    def __init__(self, stream, byte_progress=False):
+        self.stream = stream
+        # バッファごとの転送量はイベント数が多いため、指定された場合だけ出力する
+        self.byte_progress = byte_progress
+        self.started_at = time.perf_counter()
+        # コピー完了はコピースレッドから届くため、1行ずつ書き込みを排他する
+        self.lock = threading.Lock()
+
+    def write(self, record):
+        record = dict(record)
+        record["time"] = datetime.now().isoformat(timespec="milliseconds")
+        record["elapsed"] = round(time.perf_counter() - self.started_at, 3)
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self.lock:
+            self.stream.write(line)
+            self.stream.flush()
+
+    def on_event(self, event):
+        if isinstance(event, BytesCopied) and not self.byte_progress:
+            return
+        self.write(event_to_dict(event))
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    reporter = JsonLinesReporter(sys.stdout, byte_progress=args.byte_progress)
+    rating_index = None if args.no_index else open_rating_index(args.index_path)
+
+    config = CopyConfig(
+        parse_folder_numbers(args.folder_numbers),
+        args.select,
+        args.studio,
+        args.main,
+        rating_workers=args.rating_workers,
+        copy_workers=args.copy_workers,
+        copy_buffer_size=args.buffer_size * 1024,
+        use_temp_copy_folder=args.temp_copy_folder,
+        number_workers=args.number_workers,
+        io_limit=args.io_limit,
+        host_io_limit=args.host_io_limit or None,
+        use_journal=not args.no_journal,
+        journal_folder=args.journal_folder,
+        skip_identical={"size-mtime": SKIP_SIZE_MTIME, "hash": SKIP_HASH, "off": None}[args.skip_identical],
+        verify={"sync": VERIFY_SYNC, "readback": VERIFY_READBACK, "off": None}[args.verify],
+        manifest_folder=args.manifest_folder,
+        write_report=not args.no_report,
+        report_folder=args.report_folder,
+        selection_rule=args.rule,
+    )
+    engine = CopyEngine(config, listeners=[reporter.on_event], rating_index=rating_index)
+
+    # Ctrl+C は GUI の「作業中止」と同じ扱いにする
+    def on_interrupt(signum, frame):
+        engine.cancel()
+    signal.signal(signal.SIGINT, on_interrupt)
+
+    try:
+        # 処理中の print() は標準エラーへ回し、標準出力はJSONだけにする
+        with contextlib.redirect_stdout(sys.stderr):
+            status = engine.run()
+    finally:
+        if rating_index is not None:
+            rating_index.close()
+    return 0 if status == RUN_DONE else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
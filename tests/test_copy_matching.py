@@ -0,0 +1,45 @@
+import os
+
+from copy_engine import CopyEngine, CopyConfig
+from copy_events import NumberDone, FilesMatched
+from folder_scan import build_basename_index
+from test_xmp_rating import jpeg, xmp_segment, ATTRIBUTE_PACKET
+
+
+def make_shoot(tmp_path, select_names, studio_names):
+    select = tmp_path / "select" / "2024" / "1234_a"
+    studio = tmp_path / "studio" / "2024" / "1234_b"
+    main = tmp_path / "main"
+    for folder in (select, studio, main):
+        folder.mkdir(parents=True)
+    for name in select_names:
+        (select / name).write_bytes(jpeg(xmp_segment(ATTRIBUTE_PACKET)))
+    for name in studio_names:
+        (studio / name).write_bytes(b"studio " + name.encode())
+    return str(tmp_path / "select" / "2024"), str(tmp_path / "studio" / "2024"), str(main)
+
+
+def run(roots, **options):
+    events = []
+    options.setdefault("use_journal", False)
+    options.setdefault("write_report", False)
+    engine = CopyEngine(CopyConfig(["1234"], *roots, **options), listeners=[events.append])
+    return engine.run(), events
+
+
+def test_basename_index_ignores_case(tmp_path):
+    (tmp_path / "DSC_0001.jpg").write_bytes(b"1")
+    index, duplicates = build_basename_index(str(tmp_path))
+    assert index == {"dsc_0001.jpg": str(tmp_path / "DSC_0001.jpg")}
+    assert duplicates == {}
+
+
+def test_match_is_case_insensitive_and_keeps_studio_name(tmp_path):
+    roots = make_shoot(tmp_path, ["DSC_0001.JPG", "DSC_0002.jpg"], ["DSC_0001.jpg"])
+    status, events = run(roots)
+    assert status == "done"
+    matched = [event for event in events if isinstance(event, FilesMatched)][0]
+    assert matched.matched == 1
+    assert matched.unmatched_filenames == ["DSC_0002.jpg"]
+    assert os.listdir(os.path.join(roots[2], "1234_b")) == ["DSC_0001.jpg"]
+    assert [event.copied for event in events if isinstance(event, NumberDone)] == [1]
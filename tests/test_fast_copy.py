@@ -0,0 +1,110 @@
+import os
+
+import pytest
+
+import fast_copy
+from fast_copy import (ParallelCopier, VerificationError, copy_file_atomic, is_identical, MTIME_TOLERANCE_NS,
+                       SKIP_HASH, SKIP_SIZE_MTIME, VERIFY_SYNC, VERIFY_READBACK)
+
+MTIME_NS = 1_700_000_000 * 1000 * 1000 * 1000
+
+
+def write(path, data, mtime_ns=MTIME_NS):
+    path.write_bytes(data)
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+    return str(path)
+
+
+def test_sync_only_fsyncs_and_does_not_hash(tmp_path, monkeypatch):
+    source = tmp_path / "a.jpg"
+    source.write_bytes(b"x" * 1000)
+    synced = []
+    monkeypatch.setattr(fast_copy.os, "fsync", lambda fd: synced.append(fd))
+    monkeypatch.setattr(fast_copy.hashlib, "new", lambda name: pytest.fail("hash computed in sync mode"))
+    assert copy_file_atomic(str(source), str(tmp_path / "b.jpg"), verify=VERIFY_SYNC) == 1000
+    assert synced
+    assert (tmp_path / "b.jpg").read_bytes() == b"x" * 1000
+    assert ParallelCopier(verify=VERIFY_SYNC).hash_name is None
+    assert ParallelCopier(verify=VERIFY_READBACK).hash_name == fast_copy.VERIFY_HASH_NAME
+
+
+def test_readback_rejects_a_corrupted_partial(tmp_path, monkeypatch):
+    source = tmp_path / "a.jpg"
+    source.write_bytes(b"x" * 1000)
+    monkeypatch.setattr(fast_copy, "hash_file", lambda path, hash_name, buffer_size: "bad")
+    with pytest.raises(VerificationError):
+        copy_file_atomic(str(source), str(tmp_path / "b.jpg"), verify=VERIFY_READBACK)
+    assert list(tmp_path.iterdir()) == [source]
+
+
+def test_size_mtime_allows_less_than_two_seconds(tmp_path):
+    source = write(tmp_path / "a.jpg", b"x" * 10)
+    assert is_identical(source, write(tmp_path / "b.jpg", b"y" * 10, MTIME_NS + MTIME_TOLERANCE_NS - 1))
+    assert is_identical(source, write(tmp_path / "c.jpg", b"y" * 10, MTIME_NS - MTIME_TOLERANCE_NS + 1))
+    assert not is_identical(source, write(tmp_path / "d.jpg", b"y" * 10, MTIME_NS + MTIME_TOLERANCE_NS))
+
+
+def test_size_mismatch_and_missing_destination_are_copied(tmp_path):
+    source = write(tmp_path / "a.jpg", b"x" * 10)
+    assert not is_identical(source, write(tmp_path / "b.jpg", b"x" * 11))
+    assert not is_identical(source, str(tmp_path / "missing.jpg"))
+    assert not is_identical(source, write(tmp_path / "c.jpg", b"x" * 11), SKIP_HASH)
+
+
+def test_hash_mode_compares_contents(tmp_path):
+    source = write(tmp_path / "a.jpg", b"x" * 10)
+    same_times = write(tmp_path / "b.jpg", b"y" * 10)
+    assert is_identical(source, same_times, SKIP_SIZE_MTIME)
+    assert not is_identical(source, same_times, SKIP_HASH)
+    assert is_identical(source, write(tmp_path / "c.jpg", b"x" * 10, MTIME_NS + 60 * 10 ** 9), SKIP_HASH)
+
+
+def test_copy_keeps_source_mtime_when_requested(tmp_path):
+    source = write(tmp_path / "a.jpg", b"x" * 10)
+    copy_file_atomic(source, str(tmp_path / "b.jpg"), preserve_mtime=True)
+    assert os.stat(tmp_path / "b.jpg").st_mtime_ns == MTIME_NS
+    assert is_identical(source, str(tmp_path / "b.jpg"))
+    copy_file_atomic(source, str(tmp_path / "c.jpg"))
+    assert os.stat(tmp_path / "c.jpg").st_mtime_ns != MTIME_NS
+
+
+def test_parallel_copier_skips_identical_destinations(tmp_path):
+    (tmp_path / "src").mkdir()
+    (tmp_path / "dst").mkdir()
+    write(tmp_path / "src" / "same.jpg", b"x" * 10)
+    write(tmp_path / "src" / "changed.jpg", b"x" * 10)
+    write(tmp_path / "dst" / "same.jpg", b"x" * 10)
+    write(tmp_path / "dst" / "changed.jpg", b"y" * 12)
+    write(tmp_path / "src" / "new.jpg", b"z" * 5)
+    skipped = []
+    copier = ParallelCopier(workers=1, skip_identical=SKIP_SIZE_MTIME,
+                            on_file_skipped=lambda filename, nbytes: skipped.append((filename, nbytes))).start()
+    for name in ("same.jpg", "changed.jpg", "new.jpg"):
+        copier.submit(str(tmp_path / "src" / name), str(tmp_path / "dst"), name)
+    copier.finish()
+    assert skipped == [("same.jpg", 10)]
+    assert (copier.skipped_files, copier.skipped_bytes) == (1, 10)
+    assert (copier.copied_files, copier.copied_bytes) == (2, 15)
+    assert (tmp_path / "dst" / "changed.jpg").read_bytes() == b"x" * 10
+    # コピーしたファイルは更新時刻を引き継ぎ、次回は省かれる
+    assert os.stat(tmp_path / "dst" / "new.jpg").st_mtime_ns == MTIME_NS
+
+
+def test_destination_folder_is_created_once(tmp_path, monkeypatch):
+    for name in ("a.jpg", "b.jpg", "c.jpg"):
+        write(tmp_path / name, b"x")
+    (tmp_path / "dst").mkdir()
+    created = []
+    real_makedirs = os.makedirs
+
+    def makedirs(path, exist_ok=False):
+        created.append(path)
+        real_makedirs(path, exist_ok=exist_ok)
+
+    monkeypatch.setattr(fast_copy.os, "makedirs", makedirs)
+    copier = ParallelCopier(workers=1).start()
+    for name in ("a.jpg", "b.jpg", "c.jpg"):
+        copier.submit(str(tmp_path / name), str(tmp_path / "dst" / "1234"), name)
+    copier.finish()
+    assert created == [str(tmp_path / "dst" / "1234")]
+    assert sorted(os.listdir(tmp_path / "dst" / "1234")) == ["a.jpg", "b.jpg", "c.jpg"]
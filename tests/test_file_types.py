@@ -0,0 +1,75 @@
+import os
+
+import pytest
+
+from copy_engine import CopyEngine, CopyConfig, SelectListing
+from copy_events import FilesMatched
+from file_types import classify_extension, sniff_kind, KIND_EXIV2, KIND_JPEG, KIND_UNSUPPORTED
+from folder_scan import filename_key
+from test_xmp_rating import jpeg
+
+HEIC = os.path.join(os.path.dirname(__file__), os.pardir, "pyexiv2", "tests", "data", "1.heic")
+
+
+@pytest.mark.parametrize("name, kind", [
+    ("IMG_0001.jpg", KIND_JPEG),
+    ("IMG_0001.JPEG", KIND_JPEG),
+    ("IMG_0001.CR2", KIND_EXIV2),
+    ("IMG_0001.cr3", KIND_EXIV2),
+    ("IMG_0001.HEIC", KIND_EXIV2),
+    ("MVI_0001.MP4", KIND_UNSUPPORTED),
+    ("Thumbs.db", KIND_UNSUPPORTED),
+    ("IMG_0001", None),
+    ("IMG_0001.unknown", None),
+])
+def test_classify_extension(name, kind):
+    assert classify_extension(os.path.join("folder.jpg", name)) == kind
+
+
+@pytest.mark.parametrize("head, kind", [
+    (jpeg(), KIND_JPEG),
+    (b"II*\x00" + b"\x00" * 12, KIND_EXIV2),
+    (b"MM\x00*" + b"\x00" * 12, KIND_EXIV2),
+    (b"\x00\x00\x00\x18ftypcrx \x00\x00\x00\x01", KIND_EXIV2),
+    # MP4 / MOV も ftyp で始まるが、ブランドが違う
+    (b"\x00\x00\x00\x18ftypisom\x00\x00\x02\x00", KIND_UNSUPPORTED),
+    (b"\x00\x00\x00\x14ftypqt  \x00\x00\x00\x00", KIND_UNSUPPORTED),
+    (b"RIFF\x00\x00\x00\x00AVI ", KIND_UNSUPPORTED),
+    (b"\xff\xd8", KIND_UNSUPPORTED),
+    (b"", KIND_UNSUPPORTED),
+])
+def test_sniff_kind(tmp_path, head, kind):
+    path = tmp_path / "noextension"
+    path.write_bytes(head)
+    assert sniff_kind(str(path)) == kind
+
+
+def test_sniff_kind_reads_heic_and_treats_unreadable_files_as_unsupported(tmp_path):
+    assert sniff_kind(HEIC) == KIND_EXIV2
+    assert sniff_kind(str(tmp_path / "missing")) == KIND_UNSUPPORTED
+
+
+def test_unsupported_files_are_counted_and_not_rated(tmp_path):
+    select = tmp_path / "select"
+    select.mkdir()
+    files = {
+        "IMG_0001.jpg": jpeg(),
+        "IMG_0002": jpeg(),
+        "MVI_0003.mp4": b"\x00\x00\x00\x18ftypisom",
+        "IMG_0004": b"not an image",
+        "Thumbs.db": b"",
+        # サイドカーがあれば形式を問わずレーティングを読む
+        "MVI_0005.mov": b"\x00\x00\x00\x14ftypqt  ",
+        "MVI_0005.xmp": b"<x:xmpmeta/>",
+        "IMG_0006.jpg": jpeg(),
+    }
+    for name, data in files.items():
+        (select / name).write_bytes(data)
+    studio_files = {filename_key(name): name for name in files if name != "IMG_0006.jpg"}
+    events = []
+    engine = CopyEngine(CopyConfig([], "", "", ""), listeners=[events.append])
+    listing = SelectListing("1234")
+    matched = sorted(os.path.basename(path) for path in engine.iter_matched_files(str(select), studio_files, listing))
+    assert matched == ["IMG_0001.jpg", "IMG_0002", "MVI_0005.mov"]
+    assert (listing.select_files, listing.matched, listing.unsupported, listing.unmatched) == (7, 3, 3, 1)
+    assert [(event.matched, event.unsupported) for event in events if isinstance(event, FilesMatched)] == [(6, 3)]
@@ -0,0 +1,50 @@
+import os
+
+import folder_scan
+from folder_scan import ShootFolderIndex
+
+
+class VanishedEntry:
+    # 一覧には出たが stat する前に削除されたフォルダ
+    name = "1234_gone"
+    path = "/nonexistent/1234_gone"
+
+    def is_dir(self):
+        raise FileNotFoundError(2, "No such file or directory", self.path)
+
+    def is_symlink(self):
+        return False
+
+
+def test_folder_index_skips_entries_that_cannot_be_stated(tmp_path, monkeypatch):
+    (tmp_path / "1234_shoot").mkdir()
+    real_scandir = os.scandir
+
+    class Listing:
+        def __init__(self, folder):
+            self.it = real_scandir(folder)
+            self.extra = [VanishedEntry()] if folder == str(tmp_path) else []
+
+        def __enter__(self):
+            return list(self.it) + self.extra
+
+        def __exit__(self, *exc):
+            self.it.close()
+
+    monkeypatch.setattr(folder_scan.os, "scandir", Listing)
+    index = ShootFolderIndex(str(tmp_path))
+    assert index.resolve("1234", lambda path: True) == str(tmp_path / "1234_shoot")
+
+
+def test_folder_index_uses_the_shared_walk_order(tmp_path):
+    for folder in ("1234_a/1234_nested", "1234_b", "1234-x", ".1234_hidden", "other/1234_deep"):
+        (tmp_path / folder).mkdir(parents=True)
+    os.symlink(tmp_path / "1234_b", tmp_path / "1234_link")
+    index = ShootFolderIndex(str(tmp_path))
+    # ハイフンを含むもの・隠しフォルダ・シンボリックリンクは候補にしない
+    names = [name for name, _ in index.candidates["1234"]]
+    assert sorted(names) == ["1234_a", "1234_b", "1234_deep", "1234_nested"]
+    # 深さ優先の先行順（兄弟の順序は一覧の順）
+    assert names.index("1234_nested") == names.index("1234_a") + 1
+    assert index.folder_count == 6
+    assert index.resolve("1234", lambda path: not path.endswith("1234_a")) == str(tmp_path / "1234_a" / "1234_nested")
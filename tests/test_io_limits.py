@@ -0,0 +1,79 @@
+import ntpath
+import threading
+import time
+import types
+
+import pytest
+
+import io_limits
+from io_limits import IOLimiter, IOSlots, LOCAL_HOST, host_of
+
+
+@pytest.fixture
+def windows_paths(monkeypatch):
+    monkeypatch.setattr(io_limits, "os", types.SimpleNamespace(path=ntpath, sep=ntpath.sep))
+
+
+@pytest.mark.parametrize("path, host", [
+    ("\\\\SelectPC\\photo\\2024\\1234\\IMG_0001.jpg", "selectpc"),
+    # askdirectory() はスラッシュ区切りで返す
+    ("//StudioPC/photo/2024/1234/IMG_0001.jpg", "studiopc"),
+    ("z:\\2024\\1234\\IMG_0001.jpg", "Z:"),
+    ("C:/Users/main/Pictures/IMG_0001.jpg", "C:"),
+])
+def test_host_of_windows_paths(windows_paths, path, host):
+    assert host_of(path) == host
+
+
+def test_host_of_posix_mount_points(monkeypatch):
+    mounts = {"/", "/mnt/select"}
+    monkeypatch.setattr(io_limits.os.path, "ismount", lambda folder: folder in mounts)
+    io_limits._mount_point.cache_clear()
+    try:
+        assert host_of("/mnt/select/2024/1234/IMG_0001.jpg") == "/mnt/select"
+        # 撮影フォルダを渡した場合も、その親のマウントポイントになる
+        assert host_of("/mnt/select/1234_a") == "/mnt/select"
+        assert host_of("/home/main/IMG_0001.jpg") == LOCAL_HOST
+    finally:
+        io_limits._mount_point.cache_clear()
+
+
+class FailingSemaphore:
+    def acquire(self):
+        raise KeyboardInterrupt
+
+    def release(self):
+        pytest.fail("released a semaphore that was not acquired")
+
+
+def test_partial_acquire_is_released():
+    first = threading.BoundedSemaphore(1)
+    with pytest.raises(KeyboardInterrupt):
+        with IOSlots([first, FailingSemaphore()]):
+            pass
+    assert first.acquire(blocking=False)
+
+
+def test_host_limit_caps_concurrency(windows_paths):
+    limiter = IOLimiter(total_limit=8, host_limit=2)
+    lock = threading.Lock()
+    active = {"selectpc": 0, "studiopc": 0}
+    peak = dict(active)
+
+    def read(host):
+        with limiter.slots(f"\\\\{host}\\photo\\IMG_0001.jpg"):
+            with lock:
+                active[host] += 1
+                peak[host] = max(peak[host], active[host])
+            time.sleep(0.02)
+            with lock:
+                active[host] -= 1
+
+    threads = [threading.Thread(target=read, args=(host,)) for host in active for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # ホストごとに上限まで使い、片方のホストが全体の枠を使い切ることはない
+    assert peak == {"selectpc": 2, "studiopc": 2}
+    assert limiter.slots("\\\\selectpc\\a", "\\\\studiopc\\b").semaphores[-1] is limiter.total
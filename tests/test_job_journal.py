@@ -0,0 +1,106 @@
+import os
+
+from copy_engine import CopyEngine, CopyConfig
+from copy_events import ErrorOccurred, FileCopied, FileSkipped, JournalResumed, RUN_CANCELLED, RUN_DONE
+from job_journal import JobJournal
+from test_copy_matching import make_shoot
+
+
+def test_torn_trailing_line_is_dropped_and_truncated(tmp_path):
+    path = str(tmp_path / "job.jsonl")
+    journal = JobJournal(path)
+    journal.record_folder("1234", str(tmp_path), str(tmp_path))
+    journal.record_rating(str(tmp_path / "a.jpg"), 10, 20, '{"rating":"5"}')
+    journal.close(completed=False)
+    valid_size = os.path.getsize(path)
+    with open(path, "ab") as f:
+        f.write(b'{"type": "copied", "number": "1234", "de')
+
+    journal = JobJournal(path)
+    assert journal.resumed
+    assert os.path.getsize(path) == valid_size
+    assert journal.get_folder("1234") == (str(tmp_path), str(tmp_path))
+    assert journal.get_rating(str(tmp_path / "a.jpg"), 10, 20) == '{"rating":"5"}'
+    assert journal.get_rating(str(tmp_path / "a.jpg"), 10, 21) is None
+    assert journal.copied == {}
+    # 切り詰めた後に追記した行は次回も読める
+    journal.record_folder("5678", str(tmp_path), str(tmp_path))
+    journal.close(completed=False)
+    assert set(JobJournal(path).folders) == {"1234", "5678"}
+
+
+def test_resume_lookups_check_the_file_system(tmp_path):
+    path = str(tmp_path / "job.jsonl")
+    destination = tmp_path / "copied.jpg"
+    destination.write_bytes(b"x" * 10)
+    journal = JobJournal(path)
+    journal.record_folder("1234", str(tmp_path), str(tmp_path / "missing"))
+    journal.record_copied("1234", "source.jpg", str(destination), 10, None)
+    journal.record_copied("1234", "source.jpg", str(tmp_path / "deleted.jpg"), 10, None)
+    journal.close(completed=False)
+
+    journal = JobJournal(path)
+    # 記録されたフォルダが無くなっていれば解決し直す
+    assert journal.get_folder("1234") is None
+    assert journal.get_copied_size(str(destination)) == 10
+    assert journal.get_copied_size(str(tmp_path / "deleted.jpg")) is None
+    destination.write_bytes(b"x" * 5)
+    assert journal.get_copied_size(str(destination)) is None
+    journal.close(completed=True)
+    assert not os.path.exists(path)
+
+
+def test_cancelled_run_resumes_without_copying_again(tmp_path):
+    names = [f"IMG_{i:03d}.jpg" for i in range(30)]
+    roots = make_shoot(tmp_path, names, names)
+    options = dict(journal_folder=str(tmp_path / "journals"), skip_identical=None, write_report=False,
+                   rating_workers=1, copy_workers=1)
+    first_events = []
+    engine = CopyEngine(CopyConfig(["1234"], *roots, **options), listeners=[first_events.append])
+
+    def cancel_after_first_copy(event):
+        if isinstance(event, FileCopied):
+            engine.cancel()
+
+    engine.add_listener(cancel_after_first_copy)
+    assert engine.run() == RUN_CANCELLED
+    copied_first = [event.filename for event in first_events if isinstance(event, FileCopied)]
+    assert 0 < len(copied_first) < len(names)
+    assert os.listdir(tmp_path / "journals")
+
+    events = []
+    engine = CopyEngine(CopyConfig(["1234"], *roots, **options), listeners=[events.append])
+    assert engine.run() == RUN_DONE
+    assert [event.copied for event in events if isinstance(event, JournalResumed)] == [len(copied_first)]
+    skipped = [event.filename for event in events if isinstance(event, FileSkipped)]
+    assert sorted(skipped) == sorted(copied_first)
+    assert {event.reason for event in events if isinstance(event, FileSkipped)} == {"journal"}
+    copied_second = [event.filename for event in events if isinstance(event, FileCopied)]
+    assert sorted(copied_first + copied_second) == names
+    # 最後まで処理できたので記録は削除される
+    assert os.listdir(tmp_path / "journals") == []
+
+
+def test_journal_folders_are_checked_once_per_run(tmp_path, monkeypatch):
+    names = ["IMG_001.jpg", "IMG_002.jpg"]
+    roots = make_shoot(tmp_path, names, names)
+    options = dict(journal_folder=str(tmp_path / "journals"), write_report=False, rating_workers=1, copy_workers=1)
+    engine = CopyEngine(CopyConfig(["1234"], *roots, **options))
+    engine.add_listener(lambda event: engine.cancel() if isinstance(event, FileCopied) else None)
+    assert engine.run() == RUN_CANCELLED
+
+    # 2回目以降の確認ではフォルダが見えなくなった（共有フォルダの一時的な切断など）
+    real_get_folder = JobJournal.get_folder
+    calls = []
+
+    def get_folder_once(journal, number):
+        calls.append(number)
+        return real_get_folder(journal, number) if len(calls) == 1 else None
+
+    monkeypatch.setattr(JobJournal, "get_folder", get_folder_once)
+    events = []
+    engine = CopyEngine(CopyConfig(["1234"], *roots, **options), listeners=[events.append])
+    assert engine.run() == RUN_DONE
+    assert calls == ["1234"]
+    assert not [event for event in events if isinstance(event, ErrorOccurred)]
+    assert sorted(os.listdir(os.path.join(roots[2], "1234_b"))) == names
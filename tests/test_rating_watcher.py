@@ -0,0 +1,47 @@
+import os
+import time
+
+from rating_index import RatingIndex
+from rating_watcher import RatingWatcher
+from test_xmp_rating import ATTRIBUTE_PACKET, jpeg, xmp_segment
+
+OLD = time.time() - 30 * 86400
+
+
+def make_camera_folder(select, shoot, old):
+    camera = select / shoot / "CAM1"
+    camera.mkdir(parents=True)
+    image = camera / "IMG_0001.jpg"
+    image.write_bytes(jpeg(xmp_segment(ATTRIBUTE_PACKET)))
+    folders = (image, camera, select / shoot) if old else (select / shoot,)
+    for path in folders:
+        os.utime(path, (OLD, OLD))
+    return str(image)
+
+
+def test_only_stale_folders_without_subfolders_are_skipped(tmp_path):
+    select = tmp_path / "select"
+    old_image = make_camera_folder(select, "1000_old", old=True)
+    # 撮影フォルダは古いが、CAM1 の中は今日セレクトしている
+    new_image = make_camera_folder(select, "1001_new", old=False)
+
+    errors = []
+    index = RatingIndex(str(tmp_path / "index.sqlite3"))
+    watcher = RatingWatcher(str(select), index, max_files_per_second=0, max_age_days=7, on_error=errors.append)
+    try:
+        # 1回目はどのフォルダにサブフォルダが無いかを知らないため全て読む
+        watcher.scan_once()
+        assert sorted(watcher.seen) == sorted([old_image, new_image])
+        assert watcher.rated_files == 1
+        watcher.scan_once()
+        assert list(watcher.seen) == [new_image]
+        # 古いフォルダに追加されると、フォルダの更新時刻が変わって再び読む
+        added = os.path.join(os.path.dirname(old_image), "IMG_0002.jpg")
+        with open(added, "wb") as f:
+            f.write(jpeg(xmp_segment(ATTRIBUTE_PACKET)))
+        watcher.scan_once()
+        assert sorted(watcher.seen) == sorted([old_image, added, new_image])
+        assert watcher.rated_files == 2
+    finally:
+        index.close()
+    assert errors == []
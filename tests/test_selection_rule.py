@@ -0,0 +1,65 @@
+import pytest
+
+import copy_engine
+from copy_events import ErrorOccurred, NumberDone
+from selection_rule import compile_rule, RuleError, SelectionRule
+from test_copy_matching import make_shoot, run
+
+
+@pytest.mark.parametrize("text", [
+    'rating > "3"',
+    'rating == "5"',
+    'pick == "1"',
+    "label == 1",
+    "tagged == 'true'",
+    "rating == label",
+    "rating == (4, 5)",
+    "rating in 5",
+    "rating in (4, '5')",
+    "rating == 5 or (1, 2)",
+    "-label == 1",
+    "rating == None",
+    "foo == 1",
+    "__import__('os')",
+    "(lambda: 1)()",
+    "rating.real == 5",
+    "rating ==",
+])
+def test_rejected_rules(text):
+    with pytest.raises(ValueError):
+        compile_rule(text)
+
+
+@pytest.mark.parametrize("text, fields, expected", [
+    ("rating >= 4", {"rating": "4"}, True),
+    ("rating >= 4", {"rating": "3"}, False),
+    ('label == "Red"', {"label": "red"}, True),
+    ('label == "red"', {"label": "RED"}, True),
+    ('"re" in label', {"label": "Red"}, True),
+    ("pick == 1 and not tagged", {"pick": "1", "tagged": "False"}, True),
+    ("pick == 1 and not tagged", {"pick": "1", "tagged": "True"}, False),
+    ("tagged == True", {"tagged": "true"}, True),
+    ("rating in (4, 5)", {"rating": "5"}, True),
+    ("rating not in [4, 5]", {"rating": "5"}, False),
+    ("rating > -1", {"rating": "-1"}, False),
+    ("3 < rating <= 5", {"rating": "4"}, True),
+    # レーティングが無い画像は 0 として扱う
+    ("rating == 0", {}, True),
+    ("", {"rating": "5"}, True),
+])
+def test_accepted_rules(text, fields, expected):
+    assert compile_rule(text).matches(fields) is expected
+
+
+def test_evaluation_failure_is_reported_per_file(tmp_path, monkeypatch):
+    broken = SelectionRule("broken", compile("1 / 0", "<test>", "eval"), ())
+    with pytest.raises(RuleError):
+        broken.matches({})
+
+    roots = make_shoot(tmp_path, ["DSC_0001.jpg"], ["DSC_0001.jpg"])
+    monkeypatch.setattr(copy_engine, "compile_rule", lambda text: broken)
+    status, events = run(roots)
+    assert status == "done"
+    errors = [event for event in events if isinstance(event, ErrorOccurred)]
+    assert [(event.kind, event.path) for event in errors] == [("rule", str(tmp_path / "select" / "2024" / "1234_a" / "DSC_0001.jpg"))]
+    assert [(event.selected, event.copied) for event in events if isinstance(event, NumberDone)] == [(0, 0)]
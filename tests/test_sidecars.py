@@ -0,0 +1,86 @@
+import os
+
+import xmp_rating
+from copy_engine import CopyEngine, CopyConfig
+from copy_events import NumberDone
+from job_journal import JobJournal
+from rating_index import RatingIndex
+from test_copy_matching import make_shoot, run
+from test_xmp_rating import ATTRIBUTE_PACKET, jpeg, xmp_segment
+
+SIDECAR = (b'<x:xmpmeta xmlns:x="adobe:ns:meta/"><rdf:RDF><rdf:Description '
+           b'xmlns:xmp="http://ns.adobe.com/xap/1.0/" xmp:Rating="2"/></rdf:RDF></x:xmpmeta>')
+
+
+def test_both_naming_forms_are_paired_ignoring_case(tmp_path):
+    paths = [os.path.join(str(tmp_path), name) for name in (
+        "IMG_0001.JPG", "img_0001.xmp",
+        "IMG_0002.jpg", "IMG_0002.JPG.XMP",
+        "IMG_0003.jpg",
+        "orphan.xmp",
+    )]
+    sidecars = xmp_rating.find_sidecars(paths)
+    assert sidecars == {paths[0]: paths[1], paths[2]: paths[3]}
+
+
+def make_engine(tmp_path):
+    engine = CopyEngine(CopyConfig([], "", "", ""), rating_index=RatingIndex(str(tmp_path / "index.sqlite3")))
+    engine.journal = JobJournal(str(tmp_path / "job.jsonl"))
+    return engine
+
+
+def write_image_and_sidecar(tmp_path, sidecar=SIDECAR):
+    image = tmp_path / "IMG_0001.jpg"
+    image.write_bytes(jpeg(xmp_segment(ATTRIBUTE_PACKET)))
+    sidecar_path = tmp_path / "IMG_0001.xmp"
+    sidecar_path.write_bytes(sidecar)
+    return str(image), str(sidecar_path)
+
+
+def test_sidecar_takes_precedence_and_is_recorded_by_its_own_path(tmp_path):
+    image, sidecar = write_image_and_sidecar(tmp_path)
+    engine = make_engine(tmp_path)
+    try:
+        assert engine.get_xmp_fields(image, sidecar) == {"rating": "2"}
+        sidecar_stat = os.stat(sidecar)
+        image_stat = os.stat(image)
+        key = (sidecar, sidecar_stat.st_size, sidecar_stat.st_mtime_ns)
+        assert xmp_rating.decode_fields(engine.rating_index.get(*key)) == {"rating": "2"}
+        assert xmp_rating.decode_fields(engine.journal.get_rating(*key)) == {"rating": "2"}
+        assert engine.rating_index.get(image, image_stat.st_size, image_stat.st_mtime_ns) is None
+        assert engine.journal.get_rating(image, image_stat.st_size, image_stat.st_mtime_ns) is None
+
+        # サイドカーを書き換えると、画像が変わっていなくても読み直す
+        with open(sidecar, "wb") as f:
+            f.write(SIDECAR.replace(b'Rating="2"', b'Rating="4"'))
+        os.utime(sidecar, ns=(sidecar_stat.st_atime_ns, sidecar_stat.st_mtime_ns + 10 ** 9))
+        assert engine.get_xmp_fields(image, sidecar)["rating"] == "4"
+    finally:
+        engine.journal.close()
+        engine.rating_index.close()
+
+
+def test_unreadable_sidecar_falls_back_to_the_image_and_is_not_cached(tmp_path, monkeypatch):
+    image, sidecar = write_image_and_sidecar(tmp_path)
+    monkeypatch.setattr(xmp_rating, "MAX_SIDECAR_SIZE", 10)
+    engine = make_engine(tmp_path)
+    try:
+        assert engine.get_xmp_fields(image, sidecar) == {"rating": "5", "label": "Red"}
+        for path in (image, sidecar):
+            stat = os.stat(path)
+            assert engine.rating_index.get(path, stat.st_size, stat.st_mtime_ns) is None
+            assert engine.journal.get_rating(path, stat.st_size, stat.st_mtime_ns) is None
+    finally:
+        engine.journal.close()
+        engine.rating_index.close()
+
+
+def test_sidecar_rating_decides_what_is_copied(tmp_path):
+    roots = make_shoot(tmp_path, ["IMG_0001.jpg", "IMG_0002.jpg"], ["IMG_0001.jpg", "IMG_0002.jpg"])
+    # 埋め込みは両方とも星5だが、IMG_0001 はサイドカーで星2に変更されている
+    with open(os.path.join(roots[0], "1234_a", "IMG_0001.JPG.xmp"), "wb") as f:
+        f.write(SIDECAR)
+    status, events = run(roots)
+    assert status == "done"
+    assert os.listdir(os.path.join(roots[2], "1234_b")) == ["IMG_0002.jpg"]
+    assert [(event.rated, event.selected) for event in events if isinstance(event, NumberDone)] == [(2, 1)]
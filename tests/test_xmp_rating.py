@@ -0,0 +1,109 @@
+import os
+import struct
+
+import pytest
+
+import xmp_rating
+from copy_engine import CopyEngine, CopyConfig
+
+DATA_JPG = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "pyexiv2", "tests", "data", "1.jpg")
+
+
+def segment(marker, payload):
+    return b"\xff" + bytes([marker]) + struct.pack(">H", len(payload) + 2) + payload
+
+
+def jpeg(*segments, fill=b""):
+    out = b"\xff\xd8"
+    for data in segments:
+        out += fill + data
+    out += segment(0xDA, b"\x00" * 6) + b"\x00" * 100 + b"\xff\xd9"
+    return out
+
+
+def xmp_segment(packet):
+    return segment(0xE1, xmp_rating.XMP_SIGNATURE + packet)
+
+
+ATTRIBUTE_PACKET = (b'<x:xmpmeta xmlns:x="adobe:ns:meta/"><rdf:RDF><rdf:Description '
+                    b'xmlns:xmp="http://ns.adobe.com/xap/1.0/" xmp:Rating="5" xmp:Label="Red"/></rdf:RDF></x:xmpmeta>')
+ELEMENT_PACKET = (b'<x:xmpmeta><rdf:Description xmlns:xmp="http://ns.adobe.com/xap/1.0/">'
+                  b'<xmp:Rating>3</xmp:Rating></rdf:Description></x:xmpmeta>')
+XAP_PACKET = (b'<x:xmpmeta><rdf:Description xmlns:xap="http://ns.adobe.com/xap/1.0/" xap:Rating="2">'
+              b'</rdf:Description></x:xmpmeta>')
+EXIF_SEGMENT = segment(0xE1, b"Exif\x00\x00" + b"x" * 500)
+
+
+def write(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_attribute_form(tmp_path):
+    path = write(tmp_path, "a.jpg", jpeg(EXIF_SEGMENT, xmp_segment(ATTRIBUTE_PACKET)))
+    assert xmp_rating.read_fields_fast(path) == {"rating": "5", "label": "Red"}
+
+
+def test_element_form(tmp_path):
+    path = write(tmp_path, "a.jpg", jpeg(xmp_segment(ELEMENT_PACKET)))
+    assert xmp_rating.read_fields_fast(path) == {"rating": "3"}
+
+
+def test_non_default_prefix(tmp_path):
+    path = write(tmp_path, "a.jpg", jpeg(xmp_segment(XAP_PACKET)))
+    assert xmp_rating.read_fields_fast(path) == {"rating": "2"}
+
+
+def test_prefix_bound_to_other_namespace_is_ignored():
+    packet = (b'<rdf:Description xmlns:xmp="http://example.com/other/" xmp:Rating="5" '
+              b'xmlns:xap="http://ns.adobe.com/xap/1.0/" xap:Rating="1"/>')
+    assert xmp_rating.parse_xmp_fields(packet, ("rating",)) == {"rating": "1"}
+
+
+def test_missing_xmp_segment(tmp_path):
+    path = write(tmp_path, "a.jpg", jpeg(EXIF_SEGMENT))
+    assert xmp_rating.read_jpeg_xmp_packet(path) == b""
+    assert xmp_rating.read_fields_fast(path) == {}
+
+
+def test_fill_bytes_before_markers(tmp_path):
+    path = write(tmp_path, "a.jpg", jpeg(EXIF_SEGMENT, xmp_segment(ATTRIBUTE_PACKET), fill=b"\xff\xff"))
+    assert xmp_rating.read_fields_fast(path)["rating"] == "5"
+
+
+def test_truncated_segment(tmp_path):
+    data = jpeg(EXIF_SEGMENT, xmp_segment(ATTRIBUTE_PACKET))
+    cut = data.index(xmp_rating.XMP_SIGNATURE) + len(xmp_rating.XMP_SIGNATURE) + 10
+    path = write(tmp_path, "a.jpg", data[:cut])
+    assert xmp_rating.read_jpeg_xmp_packet(path) is None
+    assert xmp_rating.read_fields_fast(path) is None
+
+
+@pytest.mark.parametrize("data", [b"", b"II*\x00" + b"\x00" * 100, b"\xff\xd8\x00\x00"])
+def test_not_jpeg_or_broken_header(tmp_path, data):
+    assert xmp_rating.read_fields_fast(write(tmp_path, "a.jpg", data)) is None
+
+
+def test_missing_file(tmp_path):
+    assert xmp_rating.read_fields_fast(str(tmp_path / "missing.jpg")) is None
+
+
+def test_sample_image():
+    assert xmp_rating.read_fields_fast(DATA_JPG)["rating"] == "4"
+
+
+def test_engine_falls_back_when_header_cannot_be_read(tmp_path):
+    engine = CopyEngine(CopyConfig([], str(tmp_path), str(tmp_path), str(tmp_path), write_report=False))
+    fallbacks = []
+
+    def fake_exiv2(image_path):
+        fallbacks.append(image_path)
+        return {"rating": "5"}
+
+    engine.get_xmp_fields_with_exiv2 = fake_exiv2
+    broken = write(tmp_path, "broken.jpg", jpeg(xmp_segment(ATTRIBUTE_PACKET))[:30])
+    readable = write(tmp_path, "ok.jpg", jpeg(xmp_segment(ELEMENT_PACKET)))
+    assert engine.read_xmp_fields(broken) == {"rating": "5"}
+    assert engine.read_xmp_fields(readable) == {"rating": "3"}
+    assert fallbacks == [broken]
@@ -0,0 +1,40 @@
+"""
+コピー内容の検証で一致しなかったファイルの一覧（マニフェスト）。
+
+1行1件のJSONで追記し、後から再コピーや調査ができるようにする。
+ファイルは最初の不一致が見つかった時点で作成する。
+"""
+import json
+import os
+import threading
+from datetime import datetime
+
+MANIFEST_FILENAME_FORMAT = "verify_mismatch_%Y%m%d.jsonl"
+
+
+class VerifyManifest:
+    def __init__(self, folder):
+        self.folder = folder
+        self.path = os.path.join(folder, datetime.now().strftime(MANIFEST_FILENAME_FORMAT))
+        self.lock = threading.Lock()
+        self.count = 0
+
+    def record(self, number, error):
+        """ error は fast_copy.VerificationError。 """
+        record = {
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "number": number,
+            "source": error.source_path,
+            "dest": error.destination_path,
+            "expected": error.expected,
+            "actual": error.actual,
+        }
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self.lock:
+            os.makedirs(self.folder, exist_ok=True)
+            # 件数は少ないため1件ごとに確実に書き込む
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            self.count += 1
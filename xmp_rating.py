@@ -0,0 +1,203 @@
+"""
+JPEGのヘッダーセグメントだけを読んで Xmp.xmp.Rating などの選択に使う値を取り出す高速リーダー。
+
+画像本体（SOS以降）は読まないため、数十MBのファイルでも先頭の数十KBで済む。
+判定できない場合（JPEG以外、壊れたヘッダーなど）は None を返し、
+呼び出し側で pyexiv2 にフォールバックする。
+
+Lightroom / Bridge が画像の隣に書き出す .xmp サイドカーがある場合は、
+画像ではなくサイドカー（数KB）を読む。
+"""
+import json
+import os
+import re
+import struct
+
+# APP1 XMP セグメントの識別子
+XMP_SIGNATURE = b"http://ns.adobe.com/xap/1.0/\x00"
+XMP_NAMESPACE = b"http://ns.adobe.com/xap/1.0/"
+XMPDM_NAMESPACE = b"http://ns.adobe.com/xmp/1.0/DynamicMedia/"
+PHOTOMECHANIC_NAMESPACE = b"http://ns.camerabits.com/photomechanic/1.0/"
+
+# 選択条件で使える値: 名前 → (名前空間, プロパティ名, 名前空間の宣言が無い場合の接頭辞, pyexiv2 のキー)
+XMP_FIELDS = {
+    "rating": (XMP_NAMESPACE, b"Rating", b"xmp", "Xmp.xmp.Rating"),
+    "label": (XMP_NAMESPACE, b"Label", b"xmp", "Xmp.xmp.Label"),
+    "pick": (XMPDM_NAMESPACE, b"pick", b"xmpDM", "Xmp.xmpDM.pick"),
+    "tagged": (PHOTOMECHANIC_NAMESPACE, b"Tagged", b"photomechanic", "Xmp.photomechanic.Tagged"),
+}
+
+SOI = b"\xff\xd8"
+MARKER_APP1 = 0xE1
+MARKER_SOS = 0xDA
+MARKER_EOI = 0xD9
+# 長さフィールドを持たないマーカー（RSTn, TEM）
+STANDALONE_MARKERS = set(range(0xD0, 0xD8)) | {0x01}
+
+SIDECAR_EXTENSION = ".xmp"
+# サイドカーはXMPだけのファイルなので数KB。これを超えるものは読まない
+MAX_SIDECAR_SIZE = 4 * 1024 * 1024
+
+_NS_PREFIX_RES = {
+    namespace: re.compile(rb'xmlns:([\w.-]+)\s*=\s*["\']' + re.escape(namespace) + rb'["\']')
+    for namespace in {field[0] for field in XMP_FIELDS.values()}
+}
+
+
+def read_jpeg_xmp_packet(image_path):
+    """
+    JPEGのAPP1 XMPパケットを返す。
+    XMPが無いJPEGなら b""、JPEGとして判定できない場合は None を返す。
+    """
+    try:
+        with open(image_path, "rb") as f:
+            if f.read(2) != SOI:
+                return None
+            while True:
+                byte = f.read(1)
+                if not byte:
+                    return None
+                if byte != b"\xff":
+                    # マーカーの位置がずれている＝壊れたヘッダー
+                    return None
+                # 0xFF のフィルバイトを読み飛ばす
+                while byte == b"\xff":
+                    byte = f.read(1)
+                if not byte:
+                    return None
+                marker = byte[0]
+                if marker in STANDALONE_MARKERS:
+                    continue
+                if marker in (MARKER_SOS, MARKER_EOI):
+                    # 画像データに到達したのでXMPは存在しない
+                    return b""
+                length_bytes = f.read(2)
+                if len(length_bytes) != 2:
+                    return None
+                length = struct.unpack(">H", length_bytes)[0] - 2
+                if length < 0:
+                    return None
+                if marker == MARKER_APP1 and length >= len(XMP_SIGNATURE):
+                    head = f.read(len(XMP_SIGNATURE))
+                    if head == XMP_SIGNATURE:
+                        packet = f.read(length - len(XMP_SIGNATURE))
+                        if len(packet) != length - len(XMP_SIGNATURE):
+                            return None
+                        return packet
+                    f.seek(length - len(head), 1)
+                else:
+                    f.seek(length, 1)
+    except OSError:
+        return None
+
+
+def parse_xmp_fields(packet, names=None):
+    """
+    XMPパケットから names（XMP_FIELDS の名前、省略時は全て）の値を文字列で取り出し、辞書で返す。
+    パケットに無い値は辞書に含めない。タグ全体は解析せず、必要なプロパティだけを探す。
+    """
+    fields = {}
+    if not packet:
+        return fields
+    prefixes_by_namespace = {}
+    for name in names or XMP_FIELDS:
+        namespace, property_name, default_prefix, _ = XMP_FIELDS[name]
+        prefixes = prefixes_by_namespace.get(namespace)
+        if prefixes is None:
+            prefixes = prefixes_by_namespace[namespace] = set(_NS_PREFIX_RES[namespace].findall(packet)) or {default_prefix}
+        for prefix in prefixes:
+            value = _find_property(packet, prefix + b":" + property_name)
+            if value is not None:
+                fields[name] = value
+                break
+    return fields
+
+
+def _find_property(packet, qualified_name):
+    name = re.escape(qualified_name)
+    # 属性形式: xmp:Rating="5"
+    match = re.search(rb"\s" + name + rb'\s*=\s*["\']([^"\']*)["\']', packet)
+    if match is None:
+        # 要素形式: <xmp:Rating>5</xmp:Rating>
+        match = re.search(rb"<" + name + rb"\s*>([^<]*)</" + name + rb"\s*>", packet)
+    if match is None:
+        return None
+    return match.group(1).decode("utf-8", "replace").strip()
+
+
+def read_fields_fast(image_path):
+    """ ヘッダーのみで選択に使う値を取得する。判定できない場合は None。 """
+    packet = read_jpeg_xmp_packet(image_path)
+    if packet is None:
+        return None
+    return parse_xmp_fields(packet)
+
+
+def fields_from_exiv2(xmp):
+    """ pyexiv2 の read_xmp() の結果から、parse_xmp_fields() と同じ形の辞書を作る。 """
+    fields = {}
+    for name, (_, _, _, key) in XMP_FIELDS.items():
+        if key in xmp:
+            fields[name] = str(xmp[key]).strip()
+    return fields
+
+
+def encode_fields(fields):
+    """ レーティングインデックスや作業記録に保存する文字列にする。 """
+    return json.dumps(fields, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+
+
+def decode_fields(value):
+    """
+    encode_fields() の文字列を辞書に戻す。
+    レーティングだけを保存していた以前の形式（"5" など）は、他の値が分からないため None を返す。
+    """
+    if not value or not value.startswith("{"):
+        return None
+    try:
+        fields = json.loads(value)
+    except ValueError:
+        return None
+    return fields if isinstance(fields, dict) else None
+
+
+def is_sidecar_filename(name):
+    return name.lower().endswith(SIDECAR_EXTENSION)
+
+
+def find_sidecars(paths):
+    """
+    ファイル一覧から画像とサイドカーを対応付け、{画像のパス: サイドカーのパス} を返す。
+    Lightroom 形式（IMG_0001.xmp）と、拡張子を残す形式（IMG_0001.jpg.xmp）の両方に対応する。
+    フォルダの一覧から探すため、画像ごとにサイドカーの有無を問い合わせることはない。
+    """
+    sidecars = {}
+    for path in paths:
+        if is_sidecar_filename(path):
+            # 比較は大文字・小文字を区別しない（Windows の共有フォルダに合わせる）
+            sidecars[os.path.normcase(path[:-len(SIDECAR_EXTENSION)]).lower()] = path
+    if not sidecars:
+        return {}
+    found = {}
+    for path in paths:
+        if is_sidecar_filename(path):
+            continue
+        key = os.path.normcase(path).lower()
+        sidecar = sidecars.get(key)
+        if sidecar is None:
+            sidecar = sidecars.get(os.path.splitext(key)[0])
+        if sidecar is not None:
+            found[path] = sidecar
+    return found
+
+
+def read_sidecar_fields(sidecar_path):
+    """ サイドカーから選択に使う値を取得する。読めない場合は None（画像に埋め込まれたXMPを使う）。 """
+    try:
+        with open(sidecar_path, "rb") as f:
+            document = f.read(MAX_SIDECAR_SIZE + 1)
+    except OSError:
+        return None
+    if len(document) > MAX_SIDECAR_SIZE:
+        return None
+    return parse_xmp_fields(document)